@@ -0,0 +1,146 @@
+"""automata.py: Minimization and canonical forms of CommunicationAgent automata
+
+Two automata behave identically in every game if, starting from state 0, they send
+the same tokens and make the same final move whatever tokens they receive. Only
+states reachable from state 0 matter, and a decision state's transitions are never
+followed (the agent stops handling tokens once it has decided), so many genomes
+encode the same behaviour. canonicalize maps all of them onto one representative.
+"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+import numpy as np
+
+import tournament
+
+def reachable_states(actions, transitions):
+    """ Lists the states reachable from state 0, in breadth-first order over tokens
+
+    Args:
+        actions (list): Action of each state
+        transitions (list): Next state of each state for each token
+
+    Returns:
+        list: Reachable states, starting with 0
+    """
+
+    reachable = [0]
+    seen = {0}
+    for state in reachable:
+        if actions[state] > 0:
+            for next_state in transitions[state]:
+                if next_state not in seen:
+                    seen.add(next_state)
+                    reachable.append(next_state)
+    return reachable
+
+def equivalence_classes(actions, transitions, states):
+    """ Partitions states into classes of states that behave identically
+
+    Starts from states grouped by action and keeps splitting classes whose members
+    move to different classes on some token, until no class splits (Moore-style
+    partition refinement, the fixed point Hopcroft's algorithm reaches).
+
+    Args:
+        actions (list): Action of each state
+        transitions (list): Next state of each state for each token
+        states (list): States to partition, closed under token-sending transitions
+
+    Returns:
+        dict: state : class id
+    """
+
+    classes = {state: actions[state] for state in states}
+    num_classes = len(set(classes.values()))
+    while True:
+        signatures = {}
+        refined = {}
+        for state in states:
+            moves = tuple(classes[next_state] for next_state in transitions[state]) if actions[state] > 0 else ()
+            refined[state] = signatures.setdefault((classes[state], moves), len(signatures))
+        if len(signatures) == num_classes:
+            return refined
+        classes, num_classes = refined, len(signatures)
+
+def canonicalize(actions, transitions):
+    """ Returns the minimal automaton behaving like the given one, numbered deterministically
+
+    Unreachable states are pruned, equivalent states merged, and the remaining states
+    renumbered in breadth-first order from state 0 over tokens 0, 1, ... Decision
+    states' transitions all point back at the state itself. Automata that behave
+    identically in every game get identical canonical forms.
+
+    Args:
+        actions (np.ndarray): Action of each state
+        transitions (np.ndarray): fsm_size x num_tokens array of next states
+
+    Returns:
+        actions, transitions (np.ndarray): Canonical automaton, with as many states as behaviourally distinct ones
+    """
+
+    action_list = actions.tolist()
+    transition_list = transitions.tolist()
+    states = reachable_states(action_list, transition_list)
+    classes = equivalence_classes(action_list, transition_list, states)
+
+    # One member state per class, then number classes in breadth-first order
+    members = {}
+    for state in states:
+        members.setdefault(classes[state], state)
+    order = [classes[0]]
+    numbers = {classes[0]: 0}
+    for equivalence_class in order:
+        state = members[equivalence_class]
+        if action_list[state] > 0:
+            for next_state in transition_list[state]:
+                if classes[next_state] not in numbers:
+                    numbers[classes[next_state]] = len(order)
+                    order.append(classes[next_state])
+
+    num_tokens = transitions.shape[1]
+    canonical_actions = np.array([action_list[members[c]] for c in order], dtype=actions.dtype)
+    canonical_transitions = np.array([[numbers[classes[next_state]] for next_state in transition_list[members[c]]]
+                                      if action_list[members[c]] > 0 else [number] * num_tokens
+                                      for number, c in enumerate(order)], dtype=transitions.dtype)
+    return canonical_actions, canonical_transitions.reshape(len(order), num_tokens)
+
+def behaviour_key(actions, transitions):
+    """ Hashable key equal for exactly those automata that behave identically
+
+    Args:
+        actions (np.ndarray): Action of each state
+        transitions (np.ndarray): fsm_size x num_tokens array of next states
+    """
+
+    canonical_actions, canonical_transitions = canonicalize(actions, transitions)
+    return canonical_actions.tobytes() + canonical_transitions.tobytes()
+
+def distinct_behaviours(actions, transitions):
+    """ Groups agents whose automata behave identically
+
+    Only genomes that are distinct byte for byte are canonicalized.
+
+    Args:
+        actions (np.ndarray): N x fsm_size array of actions per state
+        transitions (np.ndarray): N x fsm_size x num_tokens array of next states
+
+    Returns:
+        representatives (np.ndarray): Row of one agent with each distinct behaviour
+        behaviour_ids (np.ndarray): Index of each agent's behaviour in representatives
+        counts (np.ndarray): Number of agents with each distinct behaviour
+    """
+
+    genome_representatives, genome_ids, _ = tournament.distinct_genomes(actions, transitions)
+
+    behaviours = {}
+    genome_behaviours = np.empty(len(genome_representatives), dtype=np.intp)
+    representatives = []
+    for genome, row in enumerate(genome_representatives):
+        key = behaviour_key(actions[row], transitions[row])
+        if key not in behaviours:
+            behaviours[key] = len(representatives)
+            representatives.append(row)
+        genome_behaviours[genome] = behaviours[key]
+
+    behaviour_ids = genome_behaviours[genome_ids]
+    return np.array(representatives, dtype=np.intp), behaviour_ids, np.bincount(behaviour_ids, minlength=len(representatives))
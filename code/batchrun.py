@@ -0,0 +1,138 @@
+"""batchrun.py: Runs any Mesa-style model over a parameter grid across worker processes, streaming results to a CSV
+
+Works with MoneyModel, WalkingModel and CommunicationModel alike - anything built from keyword
+arguments that has a step() method. Each finished run is appended to the results file as soon
+as it comes back, so a crashed or interrupted batch keeps what it finished, and re-launching
+with the same file only runs the combinations still missing.
+"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+import csv, inspect, itertools, os, random
+from multiprocessing import Pool
+import numpy as np
+
+from sweep import parameter_grid
+
+def run_key(params, names, iteration):
+    """ Identifies a run by its parameter values and iteration, as they read back from the results file """
+    return tuple(str(params[name]) for name in names) + (str(iteration),)
+
+def completed_runs(path, names):
+    """ Keys of the runs already in a results file
+
+    Args:
+        path (str): Results file written by batch_run
+        names (list): Swept parameter names
+
+    Returns:
+        set: run_key of every finished run, empty if the file does not exist yet
+    """
+
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline='') as results:
+        return {run_key(row, names, row['iteration']) for row in csv.DictReader(results)}
+
+def run_one(task):
+    """ Builds and steps one model, then evaluates the reporters on it
+
+    The run's seed is passed as seed= to models whose constructor takes one. It also seeds
+    Python's and NumPy's global generators before the model is built, which is what makes
+    MoneyModel's placement and WalkingModel's agents (their ages and attitudes come from the
+    global random module) reproducible. Models with a Mesa model.random, which RandomActivation
+    shuffles with, have it reseeded right after they are built.
+
+    Args:
+        task (tuple): (model class, constructor kwargs, iteration, seed, max_steps, model_reporters)
+
+    Returns:
+        tuple: (kwargs, iteration, seed, steps taken, reporter name : value)
+    """
+
+    model_cls, kwargs, iteration, seed, max_steps, model_reporters = task
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    takes_seed = 'seed' in inspect.signature(model_cls).parameters
+
+    model = model_cls(**dict(kwargs, seed=seed)) if takes_seed else model_cls(**kwargs)
+    if hasattr(model, 'reset_randomizer'):
+        model.reset_randomizer(seed)
+    steps = 0
+    while steps < max_steps and getattr(model, 'running', True):
+        model.step()
+        steps += 1
+
+    return kwargs, iteration, seed, steps, {name: reporter(model) for name, reporter in model_reporters.items()}
+
+def batch_run(model_cls, parameters, path, iterations=1, max_steps=100, model_reporters=None, seed=0, processes=None, progress=True):
+    """ Runs every combination of parameters iterations times, appending each run to path as it finishes
+
+    Runs already in path are skipped. Run seeds are derived from seed and the run's place in
+    the grid, so a re-launch with the same grid and seed gives the missing runs the seeds they
+    would have had.
+
+    Args:
+        model_cls: Model class (or any picklable callable) taking the parameters as keyword arguments
+        parameters (dict): Argument name : list of values (or a single value), as for BatchRunner
+        path (str): CSV file results are streamed to
+        iterations (int): Number of independently seeded runs per combination
+        max_steps (int): Steps per run, fewer if the model sets running to False; 0 only builds the model
+        model_reporters (dict): Column name : picklable function(model) evaluated once the run ends
+        seed (int): Root seed that every run's seed is derived from
+        processes (int): Number of worker processes, defaults to every core; 1 runs in this process
+        progress (bool): Whether to show a progress bar over finished runs
+
+    Returns:
+        pandas.DataFrame: Every run in path, see read_results
+    """
+
+    from tqdm import tqdm
+
+    model_reporters = dict(model_reporters or {})
+    names = list(parameters)
+    combinations = parameter_grid(parameters)
+    seeds = np.random.SeedSequence(seed).generate_state(len(combinations) * iterations, dtype=np.uint64)
+
+    done = completed_runs(path, names)
+    tasks = [(model_cls, kwargs, iteration, int(seeds[index]), max_steps, model_reporters)
+             for index, (kwargs, iteration) in enumerate(itertools.product(combinations, range(iterations)))
+             if run_key(kwargs, names, iteration) not in done]
+
+    columns = names + ['iteration', 'seed', 'steps'] + list(model_reporters)
+    new_file = not os.path.exists(path)
+
+    processes = processes or os.cpu_count()
+    if processes == 1 or len(tasks) <= 1:
+        results = map(run_one, tasks)
+        pool = None
+    else:
+        pool = Pool(min(processes, len(tasks)))
+        results = pool.imap_unordered(run_one, tasks)
+
+    try:
+        with open(path, 'a', newline='') as output:
+            writer = csv.writer(output)
+            if new_file:
+                writer.writerow(columns)
+            for kwargs, iteration, run_seed, steps, reports in tqdm(results, total=len(tasks), disable=not progress):
+                writer.writerow([kwargs[name] for name in names] + [iteration, run_seed, steps] +
+                                [reports[name] for name in model_reporters])
+                output.flush()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return read_results(path)
+
+def read_results(path):
+    """ Loads a results file written by batch_run
+
+    Returns:
+        pandas.DataFrame: One row per run, with a column per swept parameter plus iteration,
+            seed, steps and one per reporter
+    """
+
+    import pandas
+    return pandas.read_csv(path)
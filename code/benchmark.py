@@ -0,0 +1,206 @@
+"""benchmark.py: Times the communication model's hot paths and checks alternative engines against play()
+
+Usage:
+    python benchmark.py --N 50 200 --fsm-sizes 4 7 --num-tokens 2 7 --output bench.json
+"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+import argparse, itertools, json, platform, subprocess, sys, time, tracemalloc
+import numpy as np
+
+import communication
+import outcometable
+import tournament
+
+# Ways of running a generation, as CommunicationModel keyword arguments. The first is the reference.
+ENGINES = {
+    'python': dict(engine='python'),
+    'numpy': dict(engine='numpy'),
+    'dedup': dict(dedup=True),
+    'incremental': dict(incremental=True),
+    'cache': dict(engine='python', cache_size=65536),
+    'table': dict(engine='table'),
+}
+
+def timed(function, repeats=1):
+    """ Returns the best wall time of repeats calls to function, and its last result """
+
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def peak_memory(function):
+    """ Returns the peak traced allocation (bytes) while function runs """
+
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def warmed_model(parameters, engine, seed, warmup):
+    """ Builds a model and runs it for warmup generations """
+
+    model = communication.CommunicationModel(seed=seed, **dict(parameters, **ENGINES[engine]))
+    for _ in range(warmup):
+        model.step()
+    return model
+
+def play_all(model):
+    """ Plays every pairing with play(), the way run_generation's python engine does """
+
+    model.reset_agents()
+    for agent1, agent2 in itertools.combinations(model.agents, 2):
+        model.play(agent1, agent2)
+
+def benchmark_config(parameters, engines, generations, warmup, seed):
+    """ Times every hot path for one combination of model parameters
+
+    Args:
+        parameters (dict): N, fsm_size, num_tokens and max_chat_length
+        engines (list): Names from ENGINES to time run_generation with
+        generations (int): Number of generations timed per engine
+        warmup (int): Generations run before timing, so populations are past their random start
+        seed (int): Seed for every model built
+
+    Returns:
+        dict: parameters plus one entry of timings per hot path
+    """
+
+    N = parameters['N']
+    num_games = N * (N - 1) // 2
+    result = dict(parameters)
+
+    model = warmed_model(parameters, 'python', seed, warmup)
+    seconds, _ = timed(lambda: [agent.gen_automata(model.fsm_size, model.num_tokens) for agent in model.agents])
+    result['gen_automata'] = {'seconds': seconds, 'agents_per_second': N / seconds}
+    seconds, _ = timed(lambda: model.population.randomize(model.rng))
+    result['population_randomize'] = {'seconds': seconds, 'agents_per_second': N / seconds}
+
+    model = warmed_model(parameters, 'python', seed, warmup)
+    seconds, _ = timed(lambda: play_all(model))
+    result['play'] = {'seconds': seconds, 'games_per_second': num_games / seconds}
+    seconds, _ = timed(model.generate_new_population, repeats=3)
+    result['generate_new_population'] = {'seconds': seconds, 'generations_per_second': 1 / seconds,
+                                         'peak_bytes': peak_memory(model.generate_new_population)}
+
+    result['run_generation'] = {}
+    for engine in engines:
+        model = warmed_model(parameters, engine, seed, warmup)
+        seconds, _ = timed(lambda: [model.step() for _ in range(generations)])
+        result['run_generation'][engine] = {'seconds': seconds / generations,
+                                            'generations_per_second': generations / seconds,
+                                            'games_per_second': generations * num_games / seconds,
+                                            'peak_bytes': peak_memory(model.step)}
+    return result
+
+def check_engines(parameters, engines, generations, seed):
+    """ Checks that every engine reproduces the reference engine's statistics on a fixed seed
+
+    Args:
+        parameters (dict): N, fsm_size, num_tokens and max_chat_length
+        engines (list): Names from ENGINES to compare against ENGINES' first entry
+        generations (int): Number of generations compared
+        seed (int): Seed shared by every model
+
+    Returns:
+        list: Names of engines whose statistics differ from the reference
+    """
+
+    def statistics(engine):
+        model = warmed_model(parameters, engine, seed, generations)
+        return (model.total_cooperations, model.total_defections, model.total_chats,
+                model.total_proportions_cooperate, model.total_proportion_defect)
+
+    reference = statistics(next(iter(ENGINES)))
+    return [engine for engine in engines if statistics(engine) != reference]
+
+def check_play_pairs(parameters, seed):
+    """ Checks the tournament engine game by game against play() for one random population
+
+    Returns:
+        bool: Whether decisions, scores and chat lengths all match
+    """
+
+    model = warmed_model(parameters, 'python', seed, 0)
+    first, second = tournament.round_robin(model.num_agents)
+    decision1, decision2, chat_lengths = tournament.play_pairs(model.population.actions, model.population.transitions,
+                                                               first, second, model.max_chat_length)
+    for game, (i, j) in enumerate(zip(first, second)):
+        agent1, agent2 = model.agents[i], model.agents[j]
+        chat_length = model.chat(agent1, agent2)
+        if (agent1.decision, agent2.decision, chat_length) != (decision1[game], decision2[game], chat_lengths[game]):
+            return False
+    return True
+
+def tabulable(parameters):
+    """ Whether the table engine can run with parameters, building its outcome table if needed """
+
+    try:
+        outcometable.load_table(parameters['fsm_size'], parameters['num_tokens'], parameters['max_chat_length'])
+    except ValueError:
+        return False
+    return True
+
+def git_commit():
+    """ Returns the current git commit, or None outside a git checkout """
+
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--N', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--fsm-sizes', type=int, nargs='+', default=[4, 7])
+    parser.add_argument('--num-tokens', type=int, nargs='+', default=[2, 7])
+    parser.add_argument('--max-chat-lengths', type=int, nargs='+', default=[20])
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument('--generations', type=int, default=3, help='generations timed per engine')
+    parser.add_argument('--warmup', type=int, default=0, help='generations run before timing')
+    parser.add_argument('--check-generations', type=int, default=20, help='generations compared by the correctness check')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON file to save results to')
+    args = parser.parse_args(argv)
+
+    report = {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'results': [],
+        'mismatches': [],
+    }
+
+    for N, fsm_size, num_tokens, max_chat_length in itertools.product(args.N, args.fsm_sizes, args.num_tokens, args.max_chat_lengths):
+        parameters = dict(N=N, fsm_size=fsm_size, num_tokens=num_tokens, max_chat_length=max_chat_length)
+        engines = [engine for engine in args.engines if engine != 'table' or tabulable(parameters)]
+
+        mismatched = check_engines(parameters, engines, args.check_generations, args.seed)
+        if not check_play_pairs(parameters, args.seed):
+            mismatched.append('play_pairs')
+        if mismatched:
+            report['mismatches'].append(dict(parameters, engines=mismatched))
+
+        result = benchmark_config(parameters, engines, args.generations, args.warmup, args.seed)
+        report['results'].append(result)
+
+        rates = ', '.join('{} {:.1f} gen/s'.format(engine, timing['generations_per_second'])
+                          for engine, timing in result['run_generation'].items())
+        print('N={N} fsm_size={fsm_size} num_tokens={num_tokens} max_chat_length={max_chat_length}: '.format(**parameters)
+              + rates + (' MISMATCH: ' + ', '.join(mismatched) if mismatched else ''))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    return 1 if report['mismatches'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""checkpoint.py: Compact binary checkpoints of a CommunicationModel run"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+import json, os
+import numpy as np
+
+from metrics import ListSink
+
+# Prefix of the arrays holding a streaming sink's buffered records
+PENDING_PREFIX = 'pending_'
+
+# ListSink histories saved alongside the population
+HISTORIES = ('total_cooperations', 'total_defections', 'total_chats',
+             'total_proportions_cooperate', 'total_proportion_defect')
+
+def write_checkpoint(path, model):
+    """ Saves everything needed to continue a run exactly where it left off
+
+    The population genomes, generation counter, model parameters, in-memory metric
+    histories and the state of the model's random generator go into a single uncompressed .npz.
+    Streaming sinks are not flushed: how much they have written and the records still in their
+    buffer are saved instead, so checkpoints don't shrink their chunks and a resumed run can
+    drop whatever they wrote after the checkpoint. A ListSink's histories are saved whole, so
+    with one each checkpoint grows with the length of the run - stream metrics to a
+    ChunkedSink to checkpoint long runs often.
+    The file is written next to path first and moved into place, so a run killed
+    mid-write never leaves a truncated checkpoint behind.
+
+    Args:
+        path (str): File to write, conventionally ending in .npz
+        model (CommunicationModel): Model to save
+    """
+
+    arrays = {
+        'actions': model.population.actions,
+        'transitions': model.population.transitions,
+        'generation': np.array(model.generation),
+        'parameters': np.array(json.dumps(model.parameters, default=lambda value: value.item())),
+        'rng_state': np.array(json.dumps(model.rng.bit_generator.state)),
+    }
+    if isinstance(model.metrics, ListSink):
+        for history in HISTORIES:
+            arrays[history] = np.array(getattr(model.metrics, history))
+    if hasattr(model.metrics, 'pending'):
+        arrays['metrics_rows'] = np.array(model.metrics.rows_written)
+        arrays['metrics_chunks'] = np.array(model.metrics.chunks_written)
+        for field, column in model.metrics.pending().items():
+            arrays[PENDING_PREFIX + field] = column
+
+    partial_path = path + '.partial'
+    with open(partial_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(partial_path, path)
+
+def read_checkpoint(path):
+    """ Loads a checkpoint written by write_checkpoint
+
+    Args:
+        path (str): Checkpoint file
+
+    Returns:
+        dict: actions, transitions, generation, parameters, rng_state (as accepted by
+            Generator.bit_generator.state) and, if the run kept its metrics in memory, the ListSink
+            histories, or if it streamed them, metrics_rows and metrics_chunks written so far and
+            metrics_pending, the buffered records as field : array
+    """
+
+    with np.load(path) as arrays:
+        checkpoint = {
+            'actions': arrays['actions'],
+            'transitions': arrays['transitions'],
+            'generation': int(arrays['generation']),
+            'parameters': json.loads(str(arrays['parameters'])),
+            'rng_state': json.loads(str(arrays['rng_state'])),
+        }
+        for history in HISTORIES:
+            if history in arrays.files:
+                checkpoint[history] = arrays[history].tolist()
+        for count in ('metrics_rows', 'metrics_chunks'):
+            if count in arrays.files:
+                checkpoint[count] = int(arrays[count])
+        if 'metrics_rows' in arrays.files:
+            checkpoint['metrics_pending'] = {name[len(PENDING_PREFIX):]: arrays[name]
+                                             for name in arrays.files if name.startswith(PENDING_PREFIX)}
+    return checkpoint
@@ -1,13 +1,13 @@
 from __future__ import division  # Make meg's python 2 think it's python 3
 import random
-import pandas
+import sys
+import numpy as np
 
 from mesa import Agent, Model
 from mesa.time import RandomActivation
 from mesa.space import MultiGrid
-import matplotlib.pyplot as plt
-from mesa.datacollection import DataCollector
-from mesa.batchrunner import BatchRunner
+
+import placement
 
 
 class WalkingAgent(Agent):
@@ -24,7 +24,7 @@ class WalkingAgent(Agent):
 
 
 class WalkingModel(Model):
-	def __init__(self, N, width, height):
+	def __init__(self, N, width, height, seed=None):
 		self.num_agents = N
 		self.schedule = RandomActivation(self)
 		self.grid = MultiGrid(width, height, True)
@@ -33,23 +33,32 @@ class WalkingModel(Model):
 		
 		# create a grid with travel(grocery, social areas), home, and work locations
 		# self.allLocations = {}
+		rng = np.random.default_rng(seed)
 		num_travel = int (self.num_agents / 10) 		# number of travel locations
 		num_work = int (self.num_agents / 5)		
-		self.travelLocs = [(random.randint(0, width-1), random.randint(0, height-1)) for i in range(num_travel)]
-		self.workLocs = [(random.randint(0, width-1), random.randint(0, height-1)) for i in range(num_work)]
+		travelX, travelY = placement.sample_cells(rng, width, height, num_travel)
+		workX, workY = placement.sample_cells(rng, width, height, num_work)
+		self.travelLocs = list(zip(travelX.tolist(), travelY.tolist()))
+		self.workLocs = list(zip(workX.tolist(), workY.tolist()))
 
-		self.homeLocs = []
-		for i in range(self.num_agents):
-			homeX, homeY = random.randint(0,width-1), random.randint(0,height-1)
-			while (homeX, homeY) in self.workLocs or (homeX, homeY) in self.travelLocs:		# "reroll" the home location if it already exists
-				homeX, homeY = random.randint(0,width-1), random.randint(0,height-1)
+		# homes go on any cell that isn't a work or travel location - drawn from the free cells directly rather than rerolled
+		free = ~placement.occupancy(width, height, (travelX, travelY), (workX, workY))
+		homeX, homeY = placement.sample_cells(rng, width, height, self.num_agents, allowed=free)
+		jobs = rng.integers(num_work, size=self.num_agents)
+		self.homeLocs = list(zip(homeX.tolist(), homeY.tolist()))
+		agentWorkLocs = list(zip(workX[jobs].tolist(), workY[jobs].tolist()))
 
-			self.homeLocs.append((homeX, homeY))
+		# which agent lives and works where, and where the travel locations are, for vectorized queries
+		self.locations = placement.LocationIndex(width, height)
+		self.locations.add('home', homeX, homeY)
+		self.locations.add('work', workX[jobs], workY[jobs])
+		self.locations.add('travel', travelX, travelY)
 
-			agent = WalkingAgent(i, self, self.homeLocs[i], random.choice(self.workLocs))
+		for i in range(self.num_agents):
+			agent = WalkingAgent(i, self, self.homeLocs[i], agentWorkLocs[i])
 			self.schedule.add(agent)
-			self.grid.place_agent(agent, agent.home)
 			self.allAgents.append(agent)
+		placement.place_agents(self.grid, self.allAgents, homeX, homeY)
 
 		## displaying how many of each location there are
 		# homeCount = len(self.homeLocs)
@@ -64,18 +73,24 @@ class WalkingModel(Model):
 		return self.homeLocs
 
 if __name__ == "__main__":
-	import numpy as np		
+	# usage: python firstpass.py [figure.png] - saves the figure instead of showing it when given a path
+	import matplotlib
+	if len(sys.argv) > 1:
+		matplotlib.use('Agg')
+	import matplotlib.pyplot as plt
 	# place agents in home locations
 	model = WalkingModel(50, 10, 10)
 
-	workLocation_grid = np.zeros((model.grid.width, model.grid.height))
-	for agent in model.allAgents:
-		print(agent.home)
-		workLocation_grid[agent.work[0]][agent.work[1]] += 1
+	for home in model.homeLocs:
+		print(home)
+	workLocation_grid = model.locations.count_grid('work')
 	print (workLocation_grid)
 	plt.imshow(workLocation_grid, interpolation="nearest")
 	plt.colorbar()
-	plt.show()
+	if len(sys.argv) > 1:
+		plt.savefig(sys.argv[1])
+	else:
+		plt.show()
 
 	# import numpy as np
 	# agent_counts = np.zeros((model.grid.width, model.grid.height))
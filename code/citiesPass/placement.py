@@ -0,0 +1,128 @@
+"""placement.py: Vectorized placement of city locations and a spatial index of who uses which cell"""
+
+import numpy as np
+
+
+def cell_ids(x, y, height):
+	""" Flat index of each (x, y) cell, so cells can be used as array indices """
+	return np.asarray(x) * height + np.asarray(y)
+
+
+def sample_cells(rng, width, height, count, allowed=None, replace=True):
+	""" Draws count cells uniformly from the grid, or from the cells allowed marks
+
+	Equivalent to re-rolling random cells until one is allowed, but never loops: the allowed
+	cells are listed once and sampled directly.
+
+	Args:
+		rng (np.random.Generator): Source of randomness
+		width, height (int): Grid size
+		count (int): Number of cells to draw
+		allowed (np.ndarray): Optional width x height bitmap of cells that may be drawn
+		replace (bool): Whether a cell may be drawn more than once
+
+	Returns:
+		x, y (np.ndarray): Coordinates of each drawn cell
+	"""
+
+	if allowed is None:
+		cells = rng.choice(width * height, size=count, replace=replace)
+	else:
+		free = np.flatnonzero(allowed)
+		if len(free) == 0 and count > 0:
+			raise ValueError("no free cells left to place {} locations in".format(count))
+		if not replace and count > len(free):
+			raise ValueError("only {} free cells left to place {} distinct locations in".format(len(free), count))
+		cells = free[rng.choice(len(free), size=count, replace=replace)]
+	return np.divmod(cells, height)
+
+
+def occupancy(width, height, *locations):
+	""" Bitmap of the cells any of the given (x, y) coordinate arrays land on """
+
+	occupied = np.zeros((width, height), dtype=bool)
+	for x, y in locations:
+		occupied[x, y] = True
+	return occupied
+
+
+def place_agents(grid, agents, x, y):
+	""" Puts every agent on a MultiGrid at once, as place_agent would one at a time
+
+	place_agent strikes each cell off the grid's empties list with list.remove, a scan of every
+	cell per agent. Here agents go straight into their cells and empties is rebuilt once, in the
+	same cell order MultiGrid keeps it in.
+
+	Args:
+		grid (MultiGrid): Grid to fill
+		agents (list): Agents to place, each gets its pos set
+		x, y (np.ndarray): Cell of each agent
+	"""
+
+	cells = grid.grid
+	for agent, pos in zip(agents, zip(x.tolist(), y.tolist())):
+		cells[pos[0]][pos[1]].add(agent)
+		agent.pos = pos
+
+	occupied = np.zeros((grid.width, grid.height), dtype=bool)
+	occupied[x, y] = True
+	occupied = occupied.tolist()
+	grid.empties = [pos for pos in grid.empties if not occupied[pos[0]][pos[1]]]
+
+
+class LocationIndex(object):
+	"""
+	Spatial index from location type ('home', 'work', 'travel', ...) to the cells of that type
+
+	Each type holds an array of cells. For per-agent types such as 'home' and 'work', entry i
+	is agent i's cell, so queries over all agents are array operations instead of loops over
+	agent objects. Other types, such as 'travel', just list the locations, numbered 0 .. n-1.
+	"""
+
+	def __init__(self, width, height):
+		self.width = width
+		self.height = height
+		self._x = {}
+		self._y = {}
+		self._by_cell = {}
+
+	def add(self, kind, x, y):
+		""" Record the cells of location type kind
+
+		Args:
+			kind (str): Location type
+			x, y (np.ndarray): Coordinates of each location, in agent order for per-agent types
+		"""
+
+		self._x[kind] = np.asarray(x)
+		self._y[kind] = np.asarray(y)
+		self._by_cell.pop(kind, None)
+
+	def locations(self, kind):
+		""" Coordinates of every location of type kind
+
+		Returns:
+			x, y (np.ndarray): One entry per location, i.e. per agent for per-agent types
+		"""
+		return self._x[kind], self._y[kind]
+
+	def count_grid(self, kind):
+		""" width x height array counting the locations of type kind in each cell (agents, for per-agent types) """
+
+		cells = cell_ids(self._x[kind], self._y[kind], self.height)
+		return np.bincount(cells, minlength=self.width * self.height).reshape(self.width, self.height)
+
+	def occupied(self, kind):
+		""" width x height bitmap of the cells holding a location of type kind """
+		return occupancy(self.width, self.height, (self._x[kind], self._y[kind]))
+
+	def agents_at(self, kind, x, y):
+		""" Ids of the agents whose location of type kind is cell (x, y), or for other types the location numbers there """
+
+		if kind not in self._by_cell:
+			cells = cell_ids(self._x[kind], self._y[kind], self.height)
+			order = np.argsort(cells, kind='stable')
+			self._by_cell[kind] = (cells[order], order)
+		sorted_cells, order = self._by_cell[kind]
+		cell = x * self.height + y
+		return order[np.searchsorted(sorted_cells, cell, 'left'):np.searchsorted(sorted_cells, cell, 'right')]
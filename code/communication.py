@@ -2,66 +2,60 @@
 
 __author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
 
-import random, copy, itertools
-from tqdm import tqdm
+import os
 import numpy as np
-import matplotlib.pyplot as plt
 from mesa import Agent, Model
 
-# Final actions
-COOPERATE = -1
-DEFECT = -2
-NO_ACTION = -3
-
-# Payout mapping
-payout = {(COOPERATE,COOPERATE):(3,3), (COOPERATE,DEFECT):(0,5), (COOPERATE,NO_ACTION):(2,-5), (DEFECT,COOPERATE):(5,0), (DEFECT,DEFECT):(1,1), (DEFECT,NO_ACTION):(2,-5), (NO_ACTION,NO_ACTION):(-5,-5), (NO_ACTION,COOPERATE):(-5,2), (NO_ACTION,DEFECT):(-5,2)}
+import tournament
+import pairing
+from population import Population
+from gamecache import GameCache
+import automata
+import outcometable
+from metrics import ListSink
+import checkpoint
+import selection
+from profiling import NullProfiler
+from game import COOPERATE, DEFECT, NO_ACTION, payout
 
 class CommunicationAgent(Agent):
     """ 
     Represents an agent in the agent-based model investigated in 'Communication and Cooperation' - Miller, et. al
 
-    Holds an action map and transition table to define automata
+    Holds an action map and transition table to define automata. Both are views of
+    the agent's row in the model's Population, indexed as action_map[state] and
+    transition_table[(state, token)]
     """
     
-    def __init__(self, unique_id, model, fsm_size, num_tokens):
+    def __init__(self, unique_id, model, fsm_size, num_tokens, random_automata=True):
         Agent.__init__(self, unique_id, model)
         self.state = 0
         self.unique_id = unique_id
         self.scores = []
         self.decision = NO_ACTION
 
-        self.gen_automata(fsm_size, num_tokens)
+        model.agents_allocated += 1
+
+        self.action_map = model.population.actions[unique_id]
+        self.transition_table = model.population.transitions[unique_id]
+        self._behaviour_key = None
+        if random_automata:
+            self.gen_automata(fsm_size, num_tokens)
         
     def gen_automata(self, fsm_size, num_tokens):
         """ Generates action map and transition table to describe agent's automata
 
-        Creates an action map - map of state : action (token to send or final move)
-        Creates transition table - map of (state, token) : new state
+        Fills in the action map - map of state : action (token to send or final move)
+        Fills in the transition table - map of (state, token) : new state
+        Draws from the model's random generator
 
         Args:
             fsm_size (int): Number of states in automata
             num_tokens (int): Number of tokens allowed in communication
         """
 
-        # Create action map
-        self.action_map = {}
-        for state in range(fsm_size):
-            flip = random.random()
-            if (flip < 0.5 or state == 0):
-                # .5 probability of choosing a token to send
-                self.action_map[state] = random.randint(1, num_tokens-1)
-            else: 
-                # .5 probability of choosing cooperate/defect
-                self.action_map[state] = random.choice([COOPERATE, DEFECT])
-
-        # Create transition table
-        self.transition_table = {}
-        states = range(fsm_size)
-        tokens = range(num_tokens)
-
-        state_token_pairs = itertools.product(states, tokens)
-        for state_token_pair in state_token_pairs:
-            self.transition_table[state_token_pair] = random.randrange(fsm_size)
+        self._behaviour_key = None
+        self.model.population.randomize(self.model.rng, [self.unique_id])
 
     def choose_action(self):
         """ Choose agent's action (token or decision) based on current state
@@ -100,6 +94,17 @@ class CommunicationAgent(Agent):
         self.state = 0
         self.scores = []
         self.decision = NO_ACTION
+        self._behaviour_key = None
+
+    def behaviour_key(self):
+        """ Return a hashable encoding of the agent's canonical automaton, computed once per generation
+
+        Agents with equal behaviour keys play every game identically, even if their
+        action maps and transition tables differ
+        """
+        if self._behaviour_key is None:
+            self._behaviour_key = automata.behaviour_key(self.action_map, self.transition_table)
+        return self._behaviour_key
 
     def get_state(self):
         """ Return agent's automaton state """
@@ -111,12 +116,18 @@ class CommunicationAgent(Agent):
 
 
 
+# Ways of playing a generation's games
+ENGINES = ('python', 'numpy', 'table')
+
+# Ways of choosing who plays whom each generation
+PAIRINGS = ('round_robin', 'random', 'ring', 'budget')
+
 class CommunicationModel(Model):
     """ 
     Represents agent-based model investigated in 'Communication and Cooperation' - Miller, et. al
     """
     
-    def __init__(self, N=50, max_chat_length=20, fsm_size=4, num_tokens=2, mutation_rate=0.5, num_agents_compared=2):
+    def __init__(self, N=50, max_chat_length=20, fsm_size=4, num_tokens=2, mutation_rate=0.5, num_agents_compared=2, engine='python', cache_size=None, dedup=False, metrics=None, checkpoint_every=None, checkpoint_path=None, seed=None, profiler=None, incremental=False, pairing='round_robin', pairing_size=None, table_dir=None):
         """ Create a CC model with given parameters
 
         Args:
@@ -124,58 +135,220 @@ class CommunicationModel(Model):
             max_chat_length (int): Maximum number of communications allowed
             fsm_size (int): Number of states in agents' automata
             num_tokens (int): Number of communication tokens allowed
+            engine (str): How games are played each generation - 'python' plays pairs one by one
+                with play(), 'numpy' plays every pairing at once with the vectorized tournament engine,
+                'table' looks every pairing up in a precomputed outcomes table (small fsm_size and
+                num_tokens only, see outcometable.py)
+            cache_size (int): If set, play() reuses outcomes of games between behaviourally identical automata,
+                keeping at most this many in a least-recently-used GameCache
+            dedup (bool): Whether to group agents with behaviourally identical automata and play each distinct
+                pairing only once with the tournament engine, weighting results by multiplicity
+            metrics: Sink receiving each generation's statistics (see metrics.py) - defaults to a
+                ListSink, which keeps the total_* lists in memory
+            checkpoint_every (int): If set, write a checkpoint to checkpoint_path every this many generations
+            checkpoint_path (str): File checkpoints are written to, see resume()
+            seed: Seed for the model's random generator (anything np.random.default_rng accepts);
+                automata, tournaments and mutations all draw from it, so equal seeds give equal runs
+            profiler (profiling.Profiler): If given, records per-phase wall time and counters every generation
+            incremental (bool): Whether to track each genome's lineage and only replay games involving
+                genomes that are new since the previous generation, reusing earlier outcomes otherwise
+            pairing (str): Who plays whom each generation - 'round_robin' (every pair once), 'random'
+                (each agent challenges pairing_size random opponents), 'ring' (each agent plays its
+                neighbours within pairing_size places on a ring) or 'budget' (pairing_size games
+                between random pairs)
+            pairing_size (int): Opponents, radius or number of games for the chosen pairing
+            table_dir (str): Directory outcome tables are saved to and loaded from by the 'table'
+                engine - defaults to outcometable.DEFAULT_DIRECTORY
         """
-        
+
+        if engine not in ENGINES:
+            raise ValueError("engine must be one of {}, got {!r}".format(ENGINES, engine))
+        if engine == 'table' and (dedup or incremental):
+            raise ValueError("the table engine looks every game up already, it can't be combined with dedup or incremental")
+        if dedup and incremental:
+            raise ValueError("dedup and incremental are alternative evaluation modes, choose one")
+        if pairing not in PAIRINGS:
+            raise ValueError("pairing must be one of {}, got {!r}".format(PAIRINGS, pairing))
+        if pairing != 'round_robin' and (dedup or incremental):
+            raise ValueError("dedup and incremental evaluation need a round_robin pairing")
+        if pairing != 'round_robin' and pairing_size is None:
+            raise ValueError("pairing {!r} needs a pairing_size".format(pairing))
+
         self.num_agents = N
         self.max_chat_length = max_chat_length
         self.fsm_size = fsm_size
         self.num_tokens = num_tokens
         self.mutation_rate = mutation_rate
         self.num_agents_compared = num_agents_compared
+        self.engine = engine
+        self.game_cache = GameCache(cache_size) if cache_size else None
+        self.dedup = dedup
+        self.incremental = incremental
+        self.pairing = pairing
+        self.pairing_size = pairing_size
+        self._lineage_outcomes = None
+        self.outcome_table = None
+        if engine == 'table':
+            self.outcome_table = outcometable.load_table(fsm_size, num_tokens, max_chat_length,
+                                                         table_dir or outcometable.DEFAULT_DIRECTORY)
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_path = checkpoint_path
+        self.rng = np.random.default_rng(seed)
+        self.profiler = NullProfiler() if profiler is None else profiler
+        self.agents_allocated = 0
+        self.parent_fitness = None
+        self.mutated = None
+
+        # Constructor arguments needed to rebuild the model from a checkpoint
+        self.parameters = dict(N=N, max_chat_length=max_chat_length, fsm_size=fsm_size, num_tokens=num_tokens,
+                               mutation_rate=mutation_rate, num_agents_compared=num_agents_compared,
+                               engine=engine, cache_size=cache_size, dedup=dedup, incremental=incremental, seed=seed,
+                               pairing=pairing, pairing_size=pairing_size, table_dir=table_dir)
         
-        self.total_cooperations = []
-        self.total_defections = []
+        self.metrics = ListSink() if metrics is None else metrics
+        self.generation = 0
+        self.last_record = None
+        self.converged_at = None
         self.single_gen_cooperations = 0
         self.single_gen_defections = 0
-        self.total_chats = []
-        self.single_gen_chats = []
-        self.total_proportions_cooperate = []
-        self.total_proportion_defect = []
+        self.single_gen_no_actions = 0
+        self.single_gen_chat_total = 0
         
+        self.population = Population(self.num_agents, fsm_size, num_tokens)
+        self.population.randomize(self.rng)
         self.agents = []
         
         for i in range(self.num_agents):
-            agent = CommunicationAgent(i, self, fsm_size, num_tokens)
+            agent = CommunicationAgent(i, self, fsm_size, num_tokens, random_automata=False)
             self.agents.append(agent)
  
+    @classmethod
+    def resume(cls, path, metrics=None, **kwargs):
+        """ Rebuild a model from a checkpoint so stepping it continues the original run exactly
+
+        Restores the population, generation counter and the model's random generator. Metric
+        histories kept in memory are restored into a new ListSink; runs streaming metrics
+        to disk should pass a sink that appends to the original files, which is rolled back
+        to the rows it had written at the checkpoint and given back the records it had
+        buffered before the run continues.
+
+        Args:
+            path (str): Checkpoint written with checkpoint_every/checkpoint_path or checkpoint.write_checkpoint
+            metrics: Sink for the resumed run - defaults to a ListSink holding the saved histories
+            kwargs: Constructor arguments to set on top of the saved ones, e.g. checkpoint_every
+        """
+
+        saved = checkpoint.read_checkpoint(path)
+        parameters = dict(saved['parameters'], **kwargs)
+        if metrics is None:
+            metrics = ListSink()
+            for history in checkpoint.HISTORIES:
+                getattr(metrics, history).extend(saved.get(history, []))
+        elif 'metrics_rows' in saved and hasattr(metrics, 'rollback'):
+            metrics.rollback(saved['metrics_rows'], saved['metrics_chunks'], saved['metrics_pending'])
+
+        model = cls(metrics=metrics, **parameters)
+        model.population.actions[...] = saved['actions']
+        model.population.transitions[...] = saved['transitions']
+        model.population.renew_lineage()
+        model.generation = saved['generation']
+        model.rng.bit_generator.state = saved['rng_state']
+        return model
+
     def step(self):
-        self.reset_agents()
+        profiler = self.profiler
+        profiler.start_generation(self.generation)
+        agents_allocated = self.agents_allocated
+
+        with profiler.phase('reset'):
+            self.reset_agents()
         self.run_generation()
+
+        profiler.count('agents_allocated', self.agents_allocated - agents_allocated)
+        profiler.end_generation()
+
+        if self.checkpoint_every and self.generation % self.checkpoint_every == 0:
+            checkpoint.write_checkpoint(self.checkpoint_path, self)
     
+    def run(self, generations, convergence=None):
+        """ Steps the model for generations, stopping early once convergence says the run has converged
+
+        The generations left after convergence are recorded without being simulated, each with
+        the convergence detector's steady_record, and converged_at is set to the generation
+        simulation stopped at. The population and random generator stay where they were then.
+
+        Args:
+            generations (int): Number of generations to run
+            convergence (convergence.ConvergenceDetector): Optional detector checked after every step
+
+        Returns:
+            int: Number of generations actually simulated
+        """
+
+        for simulated in range(1, generations + 1):
+            self.step()
+            if convergence is not None and convergence.update(self):
+                self.converged_at = self.generation
+                self.extrapolate(generations - simulated, convergence.steady_record)
+                return simulated
+        return generations
+
+    def extrapolate(self, generations, record):
+        """ Records generations copies of record as if they had been run
+
+        Args:
+            generations (int): Number of generations to fill in
+            record (dict): Statistics of every filled in generation
+        """
+
+        for _ in range(generations):
+            self.last_record = dict(record, generation=self.generation)
+            self.metrics.record(self.last_record)
+            self.generation += 1
+
     def run_generation(self):
         """ Runs one generation of model
 
-        First, plays all agents against each other in single-shot PD game
+        First, plays agents against each other in single-shot PD games, chosen by the pairing strategy
         Next, generates new population of same size as described in C+C
         """
  
         self.single_gen_cooperations = 0
         self.single_gen_defections = 0
         self.single_gen_no_actions = 0
-        self.single_gen_chats = []
-
-        # Generate all pairings of agents to play
-        pairings = list(itertools.combinations(self.agents, 2))
-        num_games = len(pairings)
-
-        for pair in pairings:
-            self.play(pair[0], pair[1])
+        self.single_gen_chat_total = 0
+        if self.game_cache is not None:
+            self.game_cache.use_parameters(self.max_chat_length, self.fsm_size, self.num_tokens)
+
+        if self.incremental:
+            num_games = self.play_incremental()
+        elif self.dedup:
+            num_games = self.play_deduplicated()
+        elif self.engine in ('numpy', 'table'):
+            num_games = self.play_vectorized()
+        else:
+            num_games = 0
+            for first, second in self.pairings():
+                with self.profiler.phase('chat'):
+                    for i, j in zip(first.tolist(), second.tolist()):
+                        self.play(self.agents[i], self.agents[j])
+                num_games += len(first)
+
+        self.profiler.count('games', num_games)
+        self.profiler.count('chat_steps', self.single_gen_chat_total)
         
-        self.total_cooperations.append(self.single_gen_cooperations)
-        self.total_defections.append(self.single_gen_defections)
-        self.total_chats.append(np.mean(self.single_gen_chats))
-        self.total_proportions_cooperate.append(self.single_gen_cooperations / num_games)
-        self.total_proportion_defect.append(self.single_gen_defections / num_games)
+        self.last_record = {
+            'generation': self.generation,
+            'games': num_games,
+            'cooperations': self.single_gen_cooperations,
+            'defections': self.single_gen_defections,
+            'no_actions': self.single_gen_no_actions,
+            'mean_chat_length': self.single_gen_chat_total / num_games,
+            'proportion_cooperate': self.single_gen_cooperations / num_games,
+            'proportion_defect': self.single_gen_defections / num_games,
+        }
+        self.metrics.record(self.last_record)
+        self.generation += 1
 
         self.generate_new_population()
 
@@ -183,56 +356,81 @@ class CommunicationModel(Model):
         """ Generates a new population of the same size with random mutations
 
         Runs a tournament-style selection with replacement to generate a new population of agents
-        Fitter of 2 agents selected has a 50% chance of mutation to either its action map or transition table
+        Fittest of num_agents_compared agents selected has a mutation_rate chance of mutation to
+        either its action map or transition table
+
+        Every tournament, winner and mutation is drawn as a batch of arrays. Winning
+        automata are copied row by row in the population store, so the agents
+        themselves are reused across generations. Each child's parent fitness is kept in
+        parent_fitness, ranking the new population until it has played, and mutated marks
+        the children whose genome no longer matches their parent's
         """
-        
-        new_population = []
-        agents_list = []
-        high_score = 0
-        for i in range(self.num_agents):
 
-            agents_list = random.sample(self.agents, self.num_agents_compared)
+        N = self.num_agents
+        with self.profiler.phase('selection'):
+            fitness = self.fitness()
+            contestants = selection.sample_contestants(self.rng, N, self.num_agents_compared, N)
+            parents = selection.tournament_winners(fitness, contestants)
+            self.parent_fitness = fitness[parents]
+            mutations = selection.draw_mutations(self.rng, N, self.mutation_rate, self.fsm_size, self.num_tokens)
+            self.mutated = np.zeros(N, dtype=bool)
+            self.mutated[mutations.action_rows] = True
+            self.mutated[mutations.transition_rows] = True
+
+        # Copy all winning automata at once, then apply mutations to the copies
+        with self.profiler.phase('copy'):
+            self.population.select(parents)
+        with self.profiler.phase('mutation'):
+            selection.apply_mutations(self.population, mutations)
 
-            # better_agent = agent1 if np.mean(agent1.scores) > np.mean(agent2.scores) else agent2
-            for each_agent in agents_list:
-                if np.mean(each_agent.scores) > high_score:
-                    better_agent = each_agent
-                else:
-                    better_agent = agents_list[0]       ## pretty lame way of making sure at least one agent is the "best"
+    def play(self, agent1, agent2):
+        """ Plays two agents against each other in a single-shot prisoner's dilemma
 
-            # Copy automata elements from better agent
-            new_action_map = copy.deepcopy(better_agent.action_map)
-            new_transition_table = copy.deepcopy(better_agent.transition_table)
-            
-            mutate_flip = random.random() < self.mutation_rate # Roll for mutation
-            mutate_action = random.random() < 0.5 # Roll for mutation type - action map vs transition table
-
-            if mutate_flip: # roll for whether or not to mutate
-                if mutate_action: # roll for mutation type (change action map vs transition table)
-                    stateChoice = random.randrange(self.fsm_size)
-                    if random.random() < .5 or stateChoice == 0: # Roll for how to set new action map value
-                        new_action_map[stateChoice] = random.randint(1, self.num_tokens - 1)
-                    else: 
-                        new_action_map[stateChoice] = random.choice([COOPERATE, DEFECT])
-                else:
-                    new_transition_table[random.choice(list(new_transition_table.keys()))] = random.randrange(self.fsm_size)
-            
-            # Create new agent with better properties and set attributes
-            new_agent = CommunicationAgent(i, self, self.fsm_size, self.num_tokens)
-            new_agent.transition_table = new_transition_table
-            new_agent.action_map = new_action_map
+        Args:
+            agent1 (CommunicationAgent): Agent 1 in the game
+            agent2 (CommunicationAgent): Agent 2 in the game
+        """
 
-            new_population.append(new_agent)
+        if self.outcome_table is not None:
+            table = self.outcome_table
+            i, j = table.index(agent1.behaviour_key()), table.index(agent2.behaviour_key())
+            agent1.decision, agent2.decision = int(table.decisions[i, j]), int(table.decisions[j, i])
+            chat_length = int(table.chat_lengths[i, j])
+        elif self.game_cache is None:
+            chat_length = self.chat(agent1, agent2)
+        else:
+            key1, key2 = agent1.behaviour_key(), agent2.behaviour_key()
+            outcome = self.game_cache.get(key1, key2)
+            if outcome is None:
+                chat_length = self.chat(agent1, agent2)
+                self.game_cache.put(key1, key2, (agent1.decision, agent2.decision, chat_length))
+            else:
+                agent1.decision, agent2.decision, chat_length = outcome
+        self.single_gen_chat_total += chat_length
+
+        # Compute scores using payout dictionary
+        agent1_score, agent2_score = payout[(agent1.decision, agent2.decision)]
 
+        agent1.scores.append(agent1_score)
+        agent2.scores.append(agent2_score)
 
-        self.agents = new_population
+        # Record scores for statistics
+        if agent1.decision == COOPERATE and agent2.decision == COOPERATE:
+            self.single_gen_cooperations += 1
+        elif agent1.decision == DEFECT and agent2.decision == DEFECT:
+            self.single_gen_defections += 1
+        elif agent1.decision == NO_ACTION or agent2.decision == NO_ACTION:
+            self.single_gen_no_actions +=1
 
-    def play(self, agent1, agent2):
-        """ Plays two agents against each other in a single-shot prisoner's dilemma
+    def chat(self, agent1, agent2):
+        """ Runs the communication phase of a game, leaving each agent's final decision set
 
         Args:
             agent1 (CommunicationAgent): Agent 1 in the game
             agent2 (CommunicationAgent): Agent 2 in the game
+
+        Returns:
+            int: Number of communications before both agents decided
         """
 
         chat_length = 0
@@ -254,72 +452,258 @@ class CommunicationModel(Model):
             agent1.handle_token(agent2_token)
             agent2.handle_token(agent1_token)
             chat_length += 1
-        self.single_gen_chats.append(chat_length)
+        return chat_length
+    
+    def pairings(self):
+        """ Streams this generation's pairings in chunks, timing their generation as the pairing phase
 
-        # Compute scores using payout dictionaryff
-        agent1_score, agent2_score = payout[(agent1.decision, agent2.decision)]
+        Yields:
+            first, second (np.ndarray): Row index of agent 1 and agent 2 in each game of a chunk
+        """
 
-        agent1.scores.append(agent1_score)
-        agent2.scores.append(agent2_score)
+        N = self.num_agents
+        if self.pairing == 'random':
+            chunks = pairing.random_opponents(N, self.pairing_size, self.rng)
+        elif self.pairing == 'ring':
+            chunks = pairing.ring(N, self.pairing_size)
+        elif self.pairing == 'budget':
+            chunks = pairing.game_budget(N, self.pairing_size, self.rng)
+        else:
+            chunks = pairing.round_robin(N)
+
+        while True:
+            with self.profiler.phase('pairing'):
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    def play_vectorized(self):
+        """ Plays the generation's pairings a chunk at a time with the tournament engine
+
+        With an outcome table, games are looked up by each agent's behaviour instead of played.
+        Produces the same scores and statistics as calling play() on every pairing
+
+        Returns:
+            int: Number of games played
+        """
+
+        num_games = 0
+        scored_agents = []
+        scores = []
+        if self.outcome_table is not None:
+            with self.profiler.phase('chat'):
+                behaviour_ids = self.outcome_table.behaviour_ids(self.population.actions, self.population.transitions)
+
+        for first, second in self.pairings():
+            with self.profiler.phase('chat'):
+                if self.outcome_table is not None:
+                    decision1, decision2, chat_lengths = self.outcome_table.outcomes(behaviour_ids[first], behaviour_ids[second])
+                else:
+                    decision1, decision2, chat_lengths = tournament.play_pairs(self.population.actions, self.population.transitions,
+                                                                               first, second, self.max_chat_length)
+
+            with self.profiler.phase('scoring'):
+                score1, score2 = tournament.score_games(decision1, decision2)
+                # Agent 2's side first, so a round robin lists scores in the order play() appends them
+                scored_agents += [second, first]
+                scores += [score2, score1]
+
+                cooperations, defections, no_actions = tournament.tally_games(decision1, decision2)
+                self.single_gen_cooperations += cooperations
+                self.single_gen_defections += defections
+                self.single_gen_no_actions += no_actions
+                self.single_gen_chat_total += int(chat_lengths.sum())
+                num_games += len(first)
+
+        with self.profiler.phase('scoring'):
+            if scores:
+                agent_scores = tournament.gather_scores(self.num_agents, np.concatenate(scored_agents), np.concatenate(scores))
+                for agent, agent_score_list in zip(self.agents, agent_scores):
+                    agent.scores = agent_score_list
+
+        return num_games
+
+    def play_deduplicated(self):
+        """ Plays every distinct pairing of behaviours once, weighted by how many agent pairings it stands for
+
+        Agents are grouped by canonical automaton (see automata.py), so differently encoded
+        automata that play identically share their games
+
+        Each agent's scores list and the generation's statistics come out the same as
+        calling play() on every pairing
+
+        Returns:
+            int: Number of games the full round robin would have played
+        """
+
+        with self.profiler.phase('pairing'):
+            representatives, genome_ids, counts = automata.distinct_behaviours(self.population.actions, self.population.transitions)
+            first, second, weights = tournament.distinct_round_robin(counts)
+        with self.profiler.phase('chat'):
+            decision1, decision2, chat_lengths = tournament.play_pairs(self.population.actions, self.population.transitions,
+                                                                       representatives[first], representatives[second],
+                                                                       self.max_chat_length)
+
+        with self.profiler.phase('scoring'):
+            self.record_grouped_games(genome_ids, len(counts), first, second, weights, decision1, decision2, chat_lengths)
+
+        return int(weights.sum())
+
+    def play_incremental(self):
+        """ Plays every distinct pairing of lineages, replaying only games involving a new genome
+
+        Agents sharing a lineage id hold the same automaton, so they are grouped like
+        play_deduplicated groups identical genomes. Outcomes between lineages that were
+        both alive last generation are copied from then, since neither automaton has
+        changed; only pairings involving a newly mutated or drawn genome are played.
+
+        Returns:
+            int: Number of games the full round robin would have played
+        """
+
+        with self.profiler.phase('pairing'):
+            lineages, representatives, genome_ids, counts = np.unique(self.population.lineage, return_index=True,
+                                                                     return_inverse=True, return_counts=True)
+            first, second, weights = tournament.distinct_round_robin(counts)
+
+            # Map this generation's lineages onto last generation's outcome matrices
+            decisions = np.empty((len(lineages), len(lineages)), dtype=np.int8)
+            chat_matrix = np.empty((len(lineages), len(lineages)), dtype=np.int32)
+            known = np.zeros(len(lineages), dtype=bool)
+            if self._lineage_outcomes is not None:
+                previous_lineages, previous_decisions, previous_chats = self._lineage_outcomes
+                previous = np.minimum(np.searchsorted(previous_lineages, lineages), len(previous_lineages) - 1)
+                known = previous_lineages[previous] == lineages
+                kept = np.flatnonzero(known)
+                decisions[np.ix_(kept, kept)] = previous_decisions[np.ix_(previous[kept], previous[kept])]
+                chat_matrix[np.ix_(kept, kept)] = previous_chats[np.ix_(previous[kept], previous[kept])]
+            replay = ~(known[first] & known[second])
+
+        with self.profiler.phase('chat'):
+            new_first, new_second = first[replay], second[replay]
+            new_decision1, new_decision2, new_chats = tournament.play_pairs(self.population.actions, self.population.transitions,
+                                                                           representatives[new_first], representatives[new_second],
+                                                                           self.max_chat_length)
+            decisions[new_first, new_second] = new_decision1
+            decisions[new_second, new_first] = new_decision2
+            chat_matrix[new_first, new_second] = new_chats
+            chat_matrix[new_second, new_first] = new_chats
+            self._lineage_outcomes = (lineages, decisions, chat_matrix)
+
+        with self.profiler.phase('scoring'):
+            self.record_grouped_games(genome_ids.reshape(-1), len(counts), first, second, weights,
+                                      decisions[first, second], decisions[second, first], chat_matrix[first, second])
+
+        return int(weights.sum())
+
+    def record_grouped_games(self, genome_ids, num_genomes, first, second, weights, decision1, decision2, chat_lengths):
+        """ Fills in agents' scores and the generation's statistics from games between groups of identical agents
+
+        Args:
+            genome_ids (np.ndarray): Group of each agent
+            num_genomes (int): Number of groups
+            first, second (np.ndarray): Group of agent 1 and agent 2 in each game
+            weights (np.ndarray): Number of agent pairings each game stands for
+            decision1, decision2 (np.ndarray): Final action of agent 1 and agent 2 in each game
+            chat_lengths (np.ndarray): Number of communications in each game
+        """
+
+        score1, score2 = tournament.score_games(decision1, decision2)
+        genome_scores = tournament.outcome_matrix(num_genomes, first, second, score1, score2)
+        agent_scores = genome_scores[np.ix_(genome_ids, genome_ids)]
+        for agent, scores in zip(self.agents, tournament.matrix_score_lists(agent_scores)):
+            agent.scores = scores
+
+        cooperations, defections, no_actions = tournament.tally_games(decision1, decision2, weights)
+        self.single_gen_cooperations += cooperations
+        self.single_gen_defections += defections
+        self.single_gen_no_actions += no_actions
+        self.single_gen_chat_total += int(np.dot(chat_lengths, weights))
+
+    @property
+    def total_cooperations(self):
+        return self.metrics.total_cooperations
+
+    @property
+    def total_defections(self):
+        return self.metrics.total_defections
+
+    @property
+    def total_chats(self):
+        return self.metrics.total_chats
+
+    @property
+    def total_proportions_cooperate(self):
+        return self.metrics.total_proportions_cooperate
+
+    @property
+    def total_proportion_defect(self):
+        return self.metrics.total_proportion_defect
+
+    def fitness(self):
+        """ Returns each agent's mean score this generation
+
+        Means already put agents that played different numbers of games on the same
+        scale; an agent that played no games gets the population's mean fitness, so it
+        is neither favoured nor penalized in selection.
+        """
+
+        fitness = np.array([sum(agent.scores) / len(agent.scores) if agent.scores else np.nan for agent in self.agents])
+        idle = np.isnan(fitness)
+        if idle.any():
+            fitness[idle] = fitness[~idle].mean() if not idle.all() else 0
+        return fitness
+
+    def strategy_diversity(self):
+        """ Returns the number of behaviourally distinct strategies in the population """
+        return len(automata.distinct_behaviours(self.population.actions, self.population.transitions)[0])
 
-        # Record scores for statistics
-        if agent1.decision == COOPERATE and agent2.decision == COOPERATE:
-            self.single_gen_cooperations += 1
-        elif agent1.decision == DEFECT and agent2.decision == DEFECT:
-            self.single_gen_defections += 1
-        elif agent1.decision == NO_ACTION or agent2.decision == NO_ACTION:
-            self.single_gen_no_actions +=1
-    
     def reset_agents(self):
         for agent in self.agents:
             agent.reset()
 
-def sweep_mutation(iterations):
-    # Run sweep of mutation rates
-    mutation_rates = np.arange(0,0.5,0.1)
-    cooperative_gens_counts = []
-
-    for mutation_rate in mutation_rates:
-        communicationModel = CommunicationModel(mutation_rate=mutation_rate)
-        num_cooperative_gens = 0
-        for i in tqdm(range(iterations)):
-            communicationModel.step()
-            if communicationModel.total_proportions_cooperate[-1] > .1 and i > 100:
-                num_cooperative_gens += 1
-        cooperative_gens_counts.append(num_cooperative_gens)
-
-    fig = plt.figure()
-    fig.suptitle("Level of Cooperation vs. Agent Mutation Rate", fontsize=14, fontweight='bold')
-
-    axis = fig.add_subplot(111)
-    axis.plot(mutation_rates, cooperative_gens_counts)
-    axis.set_xlabel('Mutation Rate')
-    axis.set_ylabel('Rate of Cooperative Generations per 1000 Generations')
-    plt.show()
-
-def sweep_agent_comparison(iterations):
-    # Run sweep of number of agents compared
-    num_agents_compared = np.arange(2,3,1)
-    cooperative_gens_counts = []
-
-    for num_agents in num_agents_compared:
-        communicationModel = CommunicationModel(num_agents_compared=num_agents)
-        num_cooperative_gens = 0
-        for i in tqdm(range(iterations)):
-            communicationModel.step()
-            if communicationModel.total_proportions_cooperate[-1] > .1 and i > 100:
-                num_cooperative_gens += 1
-        cooperative_gens_counts.append(num_cooperative_gens)
-
-    fig = plt.figure()
-    fig.suptitle("Level of Cooperation vs. Number of Agents Compared", fontsize=14, fontweight='bold')
-
-    axis = fig.add_subplot(111)
-    axis.plot(num_agents_compared, cooperative_gens_counts)
-    axis.set_xlabel('Number of Agents Compared')
-    axis.set_ylabel('Rate of Cooperative Generations per 1000 Generations')
-    plt.show()
+def sweep_mutation(iterations, replicates=1, processes=None, path=None, plots=None):
+    # Run sweep of mutation rates - with a plotting.PlotWorker, the graph is rendered to path in the background
+    import sweep
+    from plotting import render, check_destination
+    check_destination(plots, path)
+    history = sweep.sweep({'mutation_rate': np.arange(0,0.5,0.1)}, iterations, replicates=replicates, processes=processes)
+    cooperative_gens_counts = sweep.cooperative_generations(history, 'mutation_rate')
+
+    render(plots, sweep.plot_sweep, cooperative_gens_counts, 'mutation_rate', 'cooperative_gens',
+           "Level of Cooperation vs. Agent Mutation Rate",
+           'Mutation Rate', 'Rate of Cooperative Generations per 1000 Generations', path=path)
+    return cooperative_gens_counts
+
+def sweep_agent_comparison(iterations, replicates=1, processes=None, path=None, plots=None):
+    # Run sweep of number of agents compared - with a plotting.PlotWorker, the graph is rendered to path in the background
+    import sweep
+    from plotting import render, check_destination
+    check_destination(plots, path)
+    history = sweep.sweep({'num_agents_compared': np.arange(2,3,1)}, iterations, replicates=replicates, processes=processes)
+    cooperative_gens_counts = sweep.cooperative_generations(history, 'num_agents_compared')
+
+    render(plots, sweep.plot_sweep, cooperative_gens_counts, 'num_agents_compared', 'cooperative_gens',
+           "Level of Cooperation vs. Number of Agents Compared",
+           'Number of Agents Compared', 'Rate of Cooperative Generations per 1000 Generations', path=path)
+    return cooperative_gens_counts
+
+def sweep_automata_size(iterations, fsm_sizes=range(2,8), num_tokens=range(2,8), processes=None, output_dir='../graphs', plots=None):
+    # Run sweep of automaton states x communication tokens, saving one graph per combination -
+    # with a plotting.PlotWorker, each graph is rendered as soon as its run finishes
+    import sweep
+    from plotting import render
+
+    def plot_run(run):
+        fsm_size, tokens = run.fsm_size.iloc[0], run.num_tokens.iloc[0]
+        render(plots, sweep.plot_history, run, "Cooperation Emergence - {} States, {} Tokens".format(fsm_size, tokens),
+               path=os.path.join(output_dir, '{}state{}token.png'.format(fsm_size, tokens)))
+
+    return sweep.sweep({'fsm_size': fsm_sizes, 'num_tokens': num_tokens}, iterations, processes=processes, callback=plot_run)
 
 if __name__ == '__main__':
-    # sweep_mutation(5000)
-    sweep_agent_comparison(1000)
+    from plotting import PlotWorker
+    with PlotWorker() as plots:
+        # sweep_mutation(5000, path='../graphs/mutation_rate.png', plots=plots)
+        sweep_agent_comparison(1000, path='../graphs/agents_compared.png', plots=plots)
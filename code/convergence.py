@@ -0,0 +1,70 @@
+"""convergence.py: Detects when a CommunicationModel run has stopped changing, so it can end early"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+from collections import deque
+
+# Record fields that must hold steady over the window for a run to count as stable
+STABLE_FIELDS = ('proportion_cooperate', 'proportion_defect', 'mean_chat_length')
+
+class ConvergenceDetector(object):
+    """
+    Watches a model generation by generation and reports when the rest of its run can be extrapolated
+
+    Two things end a run:
+
+    - A fixed point: without mutation, once every agent plays the same strategy, every
+      later generation plays exactly the same games, so its statistics repeat exactly.
+    - A stable window: the cooperation and defection proportions and mean chat length
+      have stayed within tolerance of each other for window generations. This is an
+      approximation - with mutation on, a stable population can still be invaded later.
+
+    steady_record then holds the statistics extrapolated over the remaining generations.
+    """
+
+    def __init__(self, window=None, tolerance=0.0):
+        """
+        Args:
+            window (int): Generations statistics must hold steady over - None only stops at fixed points
+            tolerance (float): Largest spread (max - min) of each STABLE_FIELDS value over the window
+        """
+
+        self.window = window
+        self.tolerance = tolerance
+        self.reason = None
+        self.steady_record = None
+        self._recent = deque(maxlen=window) if window else None
+        self._homogeneous = False
+
+    def update(self, model):
+        """ Checks the generation model.step() just ran
+
+        Args:
+            model (CommunicationModel): Model that has just stepped
+
+        Returns:
+            bool: Whether the run has converged, with reason ('fixed_point' or 'stable') and steady_record set
+        """
+
+        record = model.last_record
+
+        # The generation just played started from a population that can no longer change
+        if self._homogeneous:
+            return self._converge('fixed_point', dict(record))
+        self._homogeneous = model.mutation_rate == 0 and model.strategy_diversity() == 1
+
+        if self._recent is not None:
+            self._recent.append(record)
+            if len(self._recent) == self.window and all(
+                    max(r[field] for r in self._recent) - min(r[field] for r in self._recent) <= self.tolerance
+                    for field in STABLE_FIELDS):
+                steady = {field: sum(r[field] for r in self._recent) / self.window for field in record}
+                for field in ('games', 'cooperations', 'defections', 'no_actions'):
+                    steady[field] = round(steady[field])
+                return self._converge('stable', steady)
+        return False
+
+    def _converge(self, reason, steady_record):
+        self.reason = reason
+        self.steady_record = steady_record
+        return True
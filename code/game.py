@@ -0,0 +1,25 @@
+"""game.py: Actions and payouts of the single-shot prisoner's dilemma played in the communication model"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+import numpy as np
+
+# Final actions
+COOPERATE = -1
+DEFECT = -2
+NO_ACTION = -3
+
+# Payout mapping
+payout = {(COOPERATE,COOPERATE):(3,3), (COOPERATE,DEFECT):(0,5), (COOPERATE,NO_ACTION):(2,-5), (DEFECT,COOPERATE):(5,0), (DEFECT,DEFECT):(1,1), (DEFECT,NO_ACTION):(2,-5), (NO_ACTION,NO_ACTION):(-5,-5), (NO_ACTION,COOPERATE):(-5,2), (NO_ACTION,DEFECT):(-5,2)}
+
+# Payout mapping as an array indexed by [decision_index(d1), decision_index(d2)] -> (score1, score2)
+DECISIONS = (COOPERATE, DEFECT, NO_ACTION)
+payout_array = np.array([[payout[(d1, d2)] for d2 in DECISIONS] for d1 in DECISIONS], dtype=np.int8)
+
+def decision_index(decisions):
+    """ Map final actions (COOPERATE, DEFECT, NO_ACTION) onto rows of payout_array
+
+    Args:
+        decisions (int or np.ndarray): Final action(s) of an agent
+    """
+    return -1 - decisions
@@ -0,0 +1,91 @@
+"""gamecache.py: Memoizes game outcomes between behaviourally identical automata"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+from collections import OrderedDict
+
+class GameCache(object):
+    """
+    Least-recently-used cache of (decision1, decision2, chat_length) keyed on a pair of behaviour keys
+
+    A game's outcome depends on the model parameters as well as the two automata, so the
+    cache remembers the parameters its entries were played under and empties itself
+    whenever it is used with different ones.
+    """
+
+    def __init__(self, maxsize=65536):
+        """ Create an empty cache
+
+        Args:
+            maxsize (int): Maximum number of outcomes kept before the least recently used is evicted
+        """
+
+        self.maxsize = maxsize
+        self.parameters = None
+        self.hits = 0
+        self.misses = 0
+        self._outcomes = OrderedDict()
+
+    def __len__(self):
+        return len(self._outcomes)
+
+    def use_parameters(self, max_chat_length, fsm_size, num_tokens):
+        """ Declare the model parameters following lookups are played under, dropping stale entries
+
+        Args:
+            max_chat_length (int): Maximum number of communications allowed
+            fsm_size (int): Number of states in agents' automata
+            num_tokens (int): Number of communication tokens allowed
+        """
+
+        parameters = (max_chat_length, fsm_size, num_tokens)
+        if parameters != self.parameters:
+            self._outcomes.clear()
+            self.parameters = parameters
+
+    def get(self, key1, key2):
+        """ Look up the outcome of a game, or None if it hasn't been cached
+
+        Args:
+            key1, key2 (bytes): Behaviour keys (automata.behaviour_key) of agent 1 and agent 2
+
+        Returns:
+            tuple: (decision1, decision2, chat_length) from agent 1's point of view
+        """
+
+        swapped = key2 < key1
+        key = (key2, key1) if swapped else (key1, key2)
+
+        outcome = self._outcomes.get(key)
+        if outcome is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._outcomes.move_to_end(key)
+        if swapped:
+            return outcome[1], outcome[0], outcome[2]
+        return outcome
+
+    def put(self, key1, key2, outcome):
+        """ Store the outcome of a game, evicting the least recently used entry if full
+
+        Args:
+            key1, key2 (bytes): Behaviour keys (automata.behaviour_key) of agent 1 and agent 2
+            outcome (tuple): (decision1, decision2, chat_length) from agent 1's point of view
+        """
+
+        if key2 < key1:
+            key1, key2 = key2, key1
+            outcome = (outcome[1], outcome[0], outcome[2])
+
+        self._outcomes[(key1, key2)] = outcome
+        self._outcomes.move_to_end((key1, key2))
+        if len(self._outcomes) > self.maxsize:
+            self._outcomes.popitem(last=False)
+
+    def clear(self):
+        """ Drop all entries and reset the hit/miss counters """
+        self._outcomes.clear()
+        self.hits = 0
+        self.misses = 0
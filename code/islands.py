@@ -0,0 +1,276 @@
+"""islands.py: Island model running several CommunicationModel populations in parallel processes
+
+Every island is an independent CommunicationModel living in its own worker process.
+Every migration_interval generations each island sends copies of its top genomes to
+another island, where they replace the worst ones. Genomes travel through a block of
+shared memory, so migration never pickles agents or whole populations.
+"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+from multiprocessing import Pipe, Process
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+
+import communication
+from metrics import ChunkedSink, FIELDS, INTEGER_FIELDS
+from population import genome_dtype
+
+# Ways of choosing which island each island receives migrants from
+TOPOLOGIES = ('ring', 'random')
+
+def emigrant_rows(model, count):
+    """ Rows of the count agents whose parents scored best, fittest first
+
+    parent_fitness only speaks for children that are unchanged copies of their parent, so those
+    come first; mutated children, which have never been evaluated, are only taken once they run out.
+    Before the first generation has been selected every row is equally good, so the first count are taken.
+    """
+
+    if model.parent_fitness is None:
+        return np.arange(count)
+    return np.lexsort((-model.parent_fitness, model.mutated))[:count]
+
+def immigrate(model, actions, transitions):
+    """ Replaces the agents whose parents scored worst with migrant genomes
+
+    As in emigrant_rows, unchanged copies of poorly scoring parents are replaced before any
+    mutated child.
+
+    Args:
+        model (CommunicationModel): Island receiving the migrants
+        actions (np.ndarray): migrants x fsm_size array of actions per state
+        transitions (np.ndarray): migrants x fsm_size x num_tokens array of next states
+    """
+
+    if model.parent_fitness is None:
+        rows = np.arange(model.num_agents - len(actions), model.num_agents)
+    else:
+        rows = np.lexsort((model.parent_fitness, model.mutated))[:len(actions)]
+    model.population.actions[rows] = actions
+    model.population.transitions[rows] = transitions
+    model.population.renew_lineage(rows)
+
+class _EpochSink(ChunkedSink):
+    """
+    Keeps the records of the generations run since the last flush, for sending back to the main process
+    """
+
+    def __init__(self, chunk_size):
+        ChunkedSink.__init__(self, chunk_size)
+        self.columns = None
+
+    def write_chunk(self, columns):
+        self.columns = {field: column.copy() for field, column in columns.items()}
+
+def _run_island(index, num_islands, kwargs, seed, epoch_size, migrants, shared_actions, shared_transitions, connection):
+    """ Worker process body: owns one island and runs it on command
+
+    Replies None once the island is built, or the error building it raised. Each
+    command is then (generations, source, read_buffer, write_buffer). The island first
+    takes in the migrants island source left in read_buffer (if source isn't None), runs
+    for generations, then leaves its own emigrants in write_buffer (if that isn't None)
+    and replies with the records of the generations it ran. None stops the worker.
+    """
+
+    try:
+        sink = _EpochSink(epoch_size)
+        model = communication.CommunicationModel(seed=seed, metrics=sink, **kwargs)
+        slots = (2, num_islands, migrants)
+        actions = np.ndarray(slots + model.population.actions.shape[1:], dtype=model.population.actions.dtype,
+                             buffer=shared_actions.buf)
+        transitions = np.ndarray(slots + model.population.transitions.shape[1:], dtype=model.population.transitions.dtype,
+                                 buffer=shared_transitions.buf)
+    except Exception as error:
+        connection.send(error)
+        return
+    connection.send(None)
+
+    try:
+        while True:
+            command = connection.recv()
+            if command is None:
+                break
+            generations, source, read_buffer, write_buffer = command
+            try:
+                if source is not None:
+                    immigrate(model, actions[read_buffer, source], transitions[read_buffer, source])
+                for _ in range(generations):
+                    model.step()
+                if write_buffer is not None:
+                    rows = emigrant_rows(model, migrants)
+                    actions[write_buffer, index] = model.population.actions[rows]
+                    transitions[write_buffer, index] = model.population.transitions[rows]
+                sink.flush()
+                connection.send(sink.columns)
+            except Exception as error:
+                connection.send(error)
+    finally:
+        del actions, transitions
+        connection.close()
+
+class IslandModel(object):
+    """
+    Several CommunicationModel populations evolving in parallel with periodic migration
+
+    Use as a context manager, or call close() when done, so the worker processes and the
+    shared migration buffers are released:
+
+        with IslandModel(num_islands=4, N=50) as model:
+            model.run(1000)
+            model.aggregate_history()['proportion_cooperate']
+    """
+
+    def __init__(self, num_islands=4, migration_interval=10, migrants=2, topology='ring', seed=None, **kwargs):
+        """ Start one worker process per island
+
+        Args:
+            num_islands (int): Number of populations
+            migration_interval (int): Generations between migrations
+            migrants (int): Genomes each island sends per migration
+            topology (str): Where migrants go - 'ring' sends island i's migrants to island i + 1,
+                'random' shifts every island's destination by the same random offset each migration
+            seed: Root seed each island's seed, and the random topology, are derived from
+            kwargs: CommunicationModel arguments shared by every island
+        """
+
+        if topology not in TOPOLOGIES:
+            raise ValueError("topology must be one of {}, got {!r}".format(TOPOLOGIES, topology))
+        if num_islands < 2:
+            raise ValueError("an island model needs at least 2 islands, got {}".format(num_islands))
+        if not 0 < migrants <= kwargs.get('N', 50):
+            raise ValueError("migrants must be between 1 and the island population size, got {}".format(migrants))
+        if 'metrics' in kwargs:
+            raise ValueError("islands keep their own metrics, see history() and aggregate_history()")
+
+        self.num_islands = num_islands
+        self.migration_interval = migration_interval
+        self.migrants = migrants
+        self.topology = topology
+        self.generation = 0
+        self.histories = [{field: [] for field in FIELDS} for _ in range(num_islands)]
+
+        seeds = np.random.SeedSequence(seed).generate_state(num_islands + 1, dtype=np.uint64)
+        self.rng = np.random.default_rng(seeds[-1])
+        self._write_buffer = 0
+        self._migrated = False
+
+        # Two buffers of migrants: islands read last migration's while writing the next
+        fsm_size, num_tokens = kwargs.get('fsm_size', 4), kwargs.get('num_tokens', 2)
+        itemsize = np.dtype(genome_dtype(fsm_size, num_tokens)).itemsize
+        slots = 2 * num_islands * migrants * fsm_size
+        self._shared = [SharedMemory(create=True, size=slots * itemsize),
+                        SharedMemory(create=True, size=slots * num_tokens * itemsize)]
+
+        self._connections = []
+        self._workers = []
+        try:
+            for index in range(num_islands):
+                connection, worker_connection = Pipe()
+                worker = Process(target=_run_island, args=(index, num_islands, kwargs, int(seeds[index]), migration_interval, migrants,
+                                                           self._shared[0], self._shared[1], worker_connection),
+                                 daemon=True)
+                worker.start()
+                worker_connection.close()
+                self._connections.append(connection)
+                self._workers.append(worker)
+            self._receive()
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def sources(self):
+        """ Island each island takes in migrants from at the next migration """
+
+        offset = 1 if self.topology == 'ring' else self.rng.integers(1, self.num_islands)
+        return [(island - offset) % self.num_islands for island in range(self.num_islands)]
+
+    def run(self, generations):
+        """ Runs every island for generations, migrating every migration_interval generations
+
+        Args:
+            generations (int): Number of generations to run
+        """
+
+        while generations > 0:
+            epoch = min(generations, self.migration_interval - self.generation % self.migration_interval)
+            sources = self.sources() if self._migrated else [None] * self.num_islands
+            read_buffer = 1 - self._write_buffer
+            migrating = (self.generation + epoch) % self.migration_interval == 0
+            write_buffer = self._write_buffer if migrating else None
+
+            for connection, source in zip(self._connections, sources):
+                connection.send((epoch, source, read_buffer, write_buffer))
+            results = self._receive()
+            for history, columns in zip(self.histories, results):
+                for field in FIELDS:
+                    history[field].extend(columns[field].tolist())
+
+            # Migrants written this epoch are read at the start of the next one
+            self._migrated = migrating
+            if migrating:
+                self._write_buffer = 1 - self._write_buffer
+            self.generation += epoch
+            generations -= epoch
+
+    def _receive(self):
+        """ Collects one reply from every worker, re-raising the first error any of them sent """
+
+        results = [connection.recv() for connection in self._connections]
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def history(self, island):
+        """ Per-generation statistics of one island
+
+        Returns:
+            dict: metrics.FIELDS : array over every generation run
+        """
+
+        return {field: np.array(values, dtype=np.int64 if field in INTEGER_FIELDS else np.float64)
+                for field, values in self.histories[island].items()}
+
+    def aggregate_history(self):
+        """ Per-generation statistics of all islands together, as if they were one population
+
+        Counts are summed over islands and proportions and mean chat lengths are weighted by
+        each island's number of games.
+
+        Returns:
+            dict: metrics.FIELDS : array over every generation run
+        """
+
+        histories = [self.history(island) for island in range(self.num_islands)]
+        aggregate = {field: sum(history[field] for history in histories)
+                     for field in ('games', 'cooperations', 'defections', 'no_actions')}
+        aggregate['generation'] = histories[0]['generation']
+        games = aggregate['games']
+        aggregate['mean_chat_length'] = sum(history['mean_chat_length'] * history['games'] for history in histories) / games
+        aggregate['proportion_cooperate'] = aggregate['cooperations'] / games
+        aggregate['proportion_defect'] = aggregate['defections'] / games
+        return {field: aggregate[field] for field in FIELDS}
+
+    def close(self):
+        """ Stops the worker processes and frees the shared migration buffers """
+
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            connection.close()
+        for worker in self._workers:
+            worker.join()
+        self._connections, self._workers = [], []
+        for shared in self._shared:
+            shared.close()
+            shared.unlink()
+        self._shared = []
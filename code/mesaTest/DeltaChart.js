@@ -0,0 +1,42 @@
+// Draws DeltaChart frames: only the points added since the last frame arrive, the rest are kept here
+var DeltaChartModule = function(series, canvas_width, canvas_height) {
+    var canvas = $("<canvas width='" + canvas_width + "' height='" + canvas_height + "' style='border:1px dotted'></canvas>")[0];
+    $("#elements").append(canvas);
+    var context = canvas.getContext("2d");
+    var lines = series.map(function() { return []; });
+
+    var draw = function() {
+        context.clearRect(0, 0, canvas_width, canvas_height);
+        if (lines[0].length == 0) return;
+        var low = Infinity, high = -Infinity;
+        lines.forEach(function(values) {
+            values.forEach(function(value) { low = Math.min(low, value); high = Math.max(high, value); });
+        });
+        var span = high > low ? high - low : 1;
+        var length = Math.max(lines[0].length - 1, 1);
+
+        lines.forEach(function(values, s) {
+            context.beginPath();
+            context.strokeStyle = series[s].Color;
+            values.forEach(function(value, i) {
+                var x = i / length * canvas_width;
+                var y = canvas_height - (value - low) / span * canvas_height;
+                if (i == 0) context.moveTo(x, y); else context.lineTo(x, y);
+            });
+            context.stroke();
+        });
+    };
+
+    this.render = function(data) {
+        if (data.full) this.reset();
+        data.points.forEach(function(values, s) {
+            Array.prototype.push.apply(lines[s], values);
+        });
+        draw();
+    };
+
+    this.reset = function() {
+        lines = series.map(function() { return []; });
+        context.clearRect(0, 0, canvas_width, canvas_height);
+    };
+};
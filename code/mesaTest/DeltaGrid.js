@@ -0,0 +1,38 @@
+// Draws CellCountGrid frames: a flat [cell, with money, without money, ...] array of changed cells
+var DeltaGridModule = function(grid_width, grid_height, canvas_width, canvas_height) {
+    var canvas = $("<canvas width='" + canvas_width + "' height='" + canvas_height + "' style='border:1px dotted'></canvas>")[0];
+    $("#elements").append(canvas);
+    var context = canvas.getContext("2d");
+    var cell_width = canvas_width / grid_width;
+    var cell_height = canvas_height / grid_height;
+
+    var drawCell = function(cell, rich, broke) {
+        var x = Math.floor(cell / grid_height) * cell_width;
+        var y = (grid_height - 1 - cell % grid_height) * cell_height;   // y grows upward, as in CanvasGrid
+        context.clearRect(x, y, cell_width, cell_height);
+        if (rich + broke == 0) return;
+
+        context.beginPath();
+        context.arc(x + cell_width / 2, y + cell_height / 2, Math.min(cell_width, cell_height) / 4, 0, 2 * Math.PI);
+        context.fillStyle = rich > 0 ? "red" : "grey";
+        context.fill();
+        if (rich + broke > 1) {
+            context.fillStyle = "black";
+            context.textAlign = "center";
+            context.textBaseline = "middle";
+            context.fillText(rich + "/" + broke, x + cell_width / 2, y + cell_height / 2);
+        }
+    };
+
+    this.render = function(data) {
+        if (data.full) this.reset();
+        var cells = data.cells;
+        for (var i = 0; i < cells.length; i += 3) {
+            drawCell(cells[i], cells[i + 1], cells[i + 2]);
+        }
+    };
+
+    this.reset = function() {
+        context.clearRect(0, 0, canvas_width, canvas_height);
+    };
+};
@@ -1,20 +1,18 @@
 from __future__ import division         #make meg's python 2 think it's python 3
+import os
 import random
-import pandas
+import sys
+import numpy as np
 
 from mesa import Agent, Model
 from mesa.time import RandomActivation
 from mesa.space import MultiGrid
-import matplotlib.pyplot as plt
 from mesa.datacollection import DataCollector
-from mesa.batchrunner import BatchRunner
+
+from reporting import gini as gini_coefficient, ColumnarCollector
 
 def compute_gini(model):
-    agent_wealths = [agent.wealth for agent in model.schedule.agents]
-    x = sorted(agent_wealths)
-    N = model.num_agents
-    B = sum( xi * (N-i) for i,xi in enumerate(x) ) / (N*sum(x))
-    return (1 + (1/N) - 2*B)
+    return gini_coefficient(model.wealths())
     
 class MoneyAgent(Agent):
     def __init__(self, unique_id, model):
@@ -30,7 +28,8 @@ class MoneyAgent(Agent):
         self.model.grid.move_agent(self, new_position)
     
     def give_money(self):
-        cellmates = self.model.grid.get_cell_list_contents([self.pos])
+        # MultiGrid keeps cells as sets, whose order depends on memory addresses - sort so seeded runs repeat
+        cellmates = sorted(self.model.grid.get_cell_list_contents([self.pos]), key=lambda a: a.unique_id)
         if len(cellmates) > 1:
             other = random.choice(cellmates)
             other.wealth += 1
@@ -42,7 +41,14 @@ class MoneyAgent(Agent):
             self.give_money()
 
 class MoneyModel(Model):
-    def __init__(self, N, width, height):
+    def __init__(self, N, width, height, columnar=False, agent_every=1):
+        """
+        Args:
+            N (int): Number of agents
+            width, height (int): Grid size
+            columnar (bool): Whether to collect data with a ColumnarCollector instead of a DataCollector
+            agent_every (int): With columnar, keep agent wealth every agent_every steps, never if 0
+        """
         self.num_agents = N
         self.schedule = RandomActivation(self)
         self.grid = MultiGrid(width, height, True)
@@ -56,22 +62,55 @@ class MoneyModel(Model):
             y = random.randrange(self.grid.height)
             self.grid.place_agent(a, (x, y))
 
-        self.datacollector = DataCollector(
-            model_reporters= {'Gini': compute_gini},
-            agent_reporters= {'Wealth': lambda a: a.wealth})
+        if columnar:
+            self.datacollector = ColumnarCollector(
+                model_reporters= {'Gini': compute_gini},
+                agent_reporters= {'Wealth': lambda m: m.wealths()},
+                agent_every=agent_every)
+        else:
+            self.datacollector = DataCollector(
+                model_reporters= {'Gini': compute_gini},
+                agent_reporters= {'Wealth': lambda a: a.wealth})
+
+    def wealths(self):
+        """ Array of every agent's wealth, indexed by agent id """
+        wealth = np.empty(self.num_agents, dtype=np.int64)
+        for agent in self.schedule.agents:
+            wealth[agent.unique_id] = agent.wealth
+        return wealth
+
+    def cells(self):
+        """ Array of the flat cell id (x * height + y) every agent is in, indexed by agent id """
+        cells = np.empty(self.num_agents, dtype=np.int64)
+        for agent in self.schedule.agents:
+            cells[agent.unique_id] = agent.pos[0] * self.grid.height + agent.pos[1]
+        return cells
         
     def step(self):
         self.datacollector.collect(self)
         self.schedule.step()
+
+def show(name):
+    """ Show the current figure, or save it as name.png in the directory given on the command line """
+    import matplotlib.pyplot as plt
+    if len(sys.argv) > 1:
+        plt.savefig(os.path.join(sys.argv[1], name + '.png'))
+        plt.close()
+    else:
+        plt.show()
      
 if __name__ == "__main__":   
+    # usage: python MoneyModel.py [output_dir] - saves every figure to output_dir instead of showing it
+    import matplotlib
+    if len(sys.argv) > 1:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
 
     model = MoneyModel(50, 10, 10)
     for i in range(100):
         model.step()
 
     # Show a 2x2 grid where colors show number of agents present in each square
-    import numpy as np
     agent_counts = np.zeros((model.grid.width, model.grid.height))
     for cell in model.grid.coord_iter():
         cell_content, x, y = cell
@@ -79,36 +118,42 @@ if __name__ == "__main__":
         agent_counts[x][y]= agent_count
     plt.imshow(agent_counts, interpolation="nearest")
     plt.colorbar()
+    show('agent_counts')
 
     # Show the Gini Wealth Distribution
-    gini = model.datacollector.get_model_vars_dataframe()
-    gini.plot()
-    plt.show()
+    gini_frame = model.datacollector.get_model_vars_dataframe()
+    gini_frame.plot()
+    show('gini')
 
     # Show all agents wealth as a histogram
     agent_wealth = model.datacollector.get_agent_vars_dataframe()
     agent_wealth.head()
     end_wealth = agent_wealth.xs(99, level="Step")["Wealth"]
     end_wealth.hist(bins=range(agent_wealth.Wealth.max()+1))
-    plt.show()
+    show('end_wealth')
 
     # Show a single agent's wealth over each time step
     one_agent_wealth = agent_wealth.xs(14, level="AgentID")
     one_agent_wealth.Wealth.plot()
-    plt.show()
+    show('one_agent_wealth')
 
-    # Use BatchRunner to run multiple instantiations at the same time
+    # Run every instantiation 5 times across worker processes, each run streamed to batch_gini.csv as it
+    # finishes - re-running picks up where an interrupted batch stopped
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from batchrun import batch_run
     parameters = {"width" : 10,
                     "height" : 10,
-                    "N": range(10, 500, 10)}
-    batch_run = BatchRunner(MoneyModel,
-                            parameters,
-                            iterations=5,
-                            max_steps=100,
-                            model_reporters={"Gini": compute_gini})
-    # batch_run_all()
-    # show BatchRunner data as a scatter plot
-    run_data = batch_run.get_model_vars_dataframe()
+                    "N": range(10, 500, 10),
+                    "columnar": True,
+                    "agent_every": 0}
+    results_path = os.path.join(sys.argv[1] if len(sys.argv) > 1 else '.', 'batch_gini.csv')
+    run_data = batch_run(MoneyModel,
+                         parameters,
+                         results_path,
+                         iterations=5,
+                         max_steps=100,
+                         model_reporters={"Gini": compute_gini})
+    # show batch run data as a scatter plot
     run_data.head()
     plt.scatter(run_data.N, run_data.Gini)
-    plt.show()
\ No newline at end of file
+    show('batch_gini')
\ No newline at end of file
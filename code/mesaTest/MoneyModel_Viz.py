@@ -1,7 +1,9 @@
 from MoneyModel import *
+import sys
 from mesa.visualization.modules import CanvasGrid
 from mesa.visualization.ModularVisualization import ModularServer
 from mesa.visualization.modules import ChartModule
+from deltaviz import CellCountGrid, DeltaChart, every_n_steps
 
 
 def agent_portrayal(agent):
@@ -18,14 +20,27 @@ def agent_portrayal(agent):
         portrayal["r"] = 0.2
     return portrayal
 
-chart = ChartModule([{"Label": "Gini",
-                      "Color": "Black"}],
-                    data_collector_name='datacollector')
+if __name__ == "__main__":
+    # usage: python MoneyModel_Viz.py [delta [steps_per_frame]] - delta sends changed cell counts and new
+    # chart points only, and runs steps_per_frame model steps per frame drawn
+    if len(sys.argv) > 1 and sys.argv[1] == 'delta':
+        steps_per_frame = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+        grid = CellCountGrid(10, 10, 500, 500)
+        chart = DeltaChart([{"Label": "Gini",
+                             "Color": "Black"}])
+        server = ModularServer(every_n_steps(MoneyModel, steps_per_frame),
+                               [grid, chart],
+                               "Money Model",
+                               {"N": 100, "width": 10, "height": 10, "columnar": True, "agent_every": 0})
+    else:
+        chart = ChartModule([{"Label": "Gini",
+                              "Color": "Black"}],
+                            data_collector_name='datacollector')
 
-grid = CanvasGrid(agent_portrayal, 10, 10, 500, 500)
-server = ModularServer(MoneyModel,
-                       [grid, chart],
-                       "Money Model",
-                       100, 10, 10)
-server.port = 8889
-server.launch()
\ No newline at end of file
+        grid = CanvasGrid(agent_portrayal, 10, 10, 500, 500)
+        server = ModularServer(MoneyModel,
+                               [grid, chart],
+                               "Money Model",
+                               {"N": 100, "width": 10, "height": 10})
+    server.port = 8889
+    server.launch()
@@ -0,0 +1,145 @@
+"""arraymoney.py: Array-backed MoneyModel engine keeping every agent's position and wealth in NumPy arrays"""
+
+import numpy as np
+
+from mesa import Model
+
+from reporting import gini, ColumnarCollector
+
+# The eight cells around (0, 0), as in MultiGrid.get_neighborhood(pos, moore=True, include_center=False)
+MOORE_OFFSETS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)])
+
+def sequential_cellmates(rng, turn, old_cells, new_cells):
+    """ Picks a uniformly random cellmate for each agent as seen at its turn, the agent itself included
+
+    With agents activated one at a time, at agent k's turn the agents that acted before it are
+    already on their new cells and the ones after it are still on their old cells. Keying cells by
+    cell * N + turn orders every cell's agents by turn, so both groups are contiguous runs of the
+    sorted keys and picking from them is a single index.
+
+    Args:
+        rng (np.random.Generator): Source of randomness
+        turn (np.ndarray): Position of every agent in the activation order, a permutation of 0 .. N-1
+        old_cells, new_cells (np.ndarray): Flat cell id of every agent before and after it moves
+
+    Returns:
+        cellmates (np.ndarray): Agent picked for each agent
+        crowded (np.ndarray): Whether each agent had anyone else in its cell at its turn
+    """
+
+    N = len(turn)
+    moved = new_cells * N + turn
+    moved_order = np.argsort(moved)
+    moved_sorted = moved[moved_order]
+    waiting = old_cells * N + turn
+    waiting_order = np.argsort(waiting)
+    waiting_sorted = waiting[waiting_order]
+
+    # Agents that acted earlier and moved into k's cell, then agents yet to act still in it
+    earlier_start = np.searchsorted(moved_sorted, new_cells * N, 'left')
+    earlier = np.searchsorted(moved_sorted, moved, 'left') - earlier_start
+    later_start = np.searchsorted(waiting_sorted, moved, 'right')
+    later = np.searchsorted(waiting_sorted, (new_cells + 1) * N, 'left') - later_start
+
+    sizes = earlier + later + 1
+    picks = (rng.random(N) * sizes).astype(np.intp)
+    cellmates = np.where(picks < earlier,
+                         moved_order[np.minimum(earlier_start + picks, N - 1)],
+                         waiting_order[np.clip(later_start + picks - earlier - 1, 0, N - 1)])
+    cellmates[picks == earlier] = np.flatnonzero(picks == earlier)
+    return cellmates, sizes > 1
+
+def sequential_givers(turn, wealth, cellmates, crowded):
+    """ Which agents give money when agents act one at a time in turn order
+
+    Agents holding money at the start of the step give whenever they have company. Broke agents
+    give only if someone whose turn came earlier gave to them, which can chain through several
+    agents, so givers are added round by round until no earlier gift changes anything.
+
+    Args:
+        turn (np.ndarray): Position of every agent in the activation order
+        wealth (np.ndarray): Every agent's wealth at the start of the step
+        cellmates, crowded (np.ndarray): As returned by sequential_cellmates
+
+    Returns:
+        np.ndarray: Whether each agent gives 1 to its cellmate
+    """
+
+    N = len(turn)
+    givers = crowded & (wealth > 0)
+    while True:
+        first_gift = np.full(N, N)
+        np.minimum.at(first_gift, cellmates[givers], turn[givers])
+        now = crowded & ((wealth > 0) | (first_gift < turn))
+        if (now == givers).all():
+            return givers
+        givers = now
+
+class ArrayMoneyModel(Model):
+    """
+    MoneyModel with agents stored as arrays instead of MoneyAgent objects on a MultiGrid
+
+    Each step every agent moves to a random Moore neighbour on the torus, then every agent
+    with money that shares its cell gives 1 to a random cellmate (possibly itself, as
+    get_cell_list_contents includes the giver in the reference model).
+
+    Agents act one at a time in a random order, as under RandomActivation: an agent meets the
+    cellmates that have not moved yet as well as those that already have, and can pass on money
+    it received earlier in the same step. The whole order is resolved with array operations
+    instead of a loop over agents.
+    """
+
+    def __init__(self, N, width, height, seed=None, agent_every=1):
+        """ Places N agents holding 1 each at random cells
+
+        Args:
+            N (int): Number of agents
+            width, height (int): Grid size
+            seed: Seed for the model's random generator (anything np.random.default_rng accepts)
+            agent_every (int): Keep agent wealth every agent_every steps, never if 0
+        """
+
+        self.num_agents = N
+        self.width = width
+        self.height = height
+        self.running = True
+        self.rng = np.random.default_rng(seed)
+
+        self.x = self.rng.integers(width, size=N)
+        self.y = self.rng.integers(height, size=N)
+        self.wealth = np.ones(N, dtype=np.int64)
+
+        self.datacollector = ColumnarCollector(
+            model_reporters= {'Gini': lambda m: gini(m.wealth)},
+            agent_reporters= {'Wealth': lambda m: m.wealth},
+            agent_every=agent_every)
+
+    def wealths(self):
+        """ Array of every agent's wealth, indexed by agent id """
+        return self.wealth
+
+    def cells(self):
+        """ Flat cell id of every agent """
+        return self.x * self.height + self.y
+
+    def move(self):
+        offsets = MOORE_OFFSETS[self.rng.integers(len(MOORE_OFFSETS), size=self.num_agents)]
+        self.x = (self.x + offsets[:, 0]) % self.width
+        self.y = (self.y + offsets[:, 1]) % self.height
+
+    def give_money(self, turn, old_cells):
+        cellmates, crowded = sequential_cellmates(self.rng, turn, old_cells, self.cells())
+        givers = sequential_givers(turn, self.wealth, cellmates, crowded)
+        self.wealth -= givers
+        self.wealth += np.bincount(cellmates[givers], minlength=self.num_agents)
+
+    def step(self):
+        self.datacollector.collect(self)
+        turn = self.rng.permutation(self.num_agents)
+        old_cells = self.cells()
+        self.move()
+        self.give_money(turn, old_cells)
+
+    def agent_counts(self):
+        """ width x height array of the number of agents in each cell """
+        return np.bincount(self.cells(), minlength=self.width * self.height).reshape(self.width, self.height)
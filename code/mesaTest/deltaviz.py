@@ -0,0 +1,155 @@
+"""deltaviz.py: Visualization elements that send per-cell counts and new chart points instead of whole frames
+
+CanvasGrid sends a portrayal dict per agent every step and redraws everything. CellCountGrid
+counts agents with and without money in each cell, and after the first frame sends only the
+cells whose counts changed, as one flat array. DeltaChart sends only the points added since
+the last frame. Both keep what they last sent, so they expect a single browser connection.
+
+Models need wealths() and cells() arrays, as MoneyModel and ArrayMoneyModel have.
+
+usage: python deltaviz.py [N] [steps] - measures bytes per step of the default and delta elements headlessly
+"""
+
+import json
+import sys
+import time
+import numpy as np
+
+from mesa.visualization.ModularVisualization import VisualizationElement
+
+class CellCountGrid(VisualizationElement):
+    """
+    Grid drawn from per-cell counts of agents with and without money, sent as changed cells only
+
+    Each frame is {'full': bool, 'cells': [cell, with money, without money, cell, ...]} where cell
+    is x * grid_height + y. full frames list every occupied cell and tell the browser to clear first.
+    """
+
+    package_includes = []
+    local_includes = ["DeltaGrid.js"]
+
+    def __init__(self, grid_width, grid_height, canvas_width=500, canvas_height=500):
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.js_code = "elements.push(new DeltaGridModule({}, {}, {}, {}));".format(
+            grid_width, grid_height, canvas_width, canvas_height)
+        self._model = None
+        self._previous = None
+
+    def render(self, model):
+        wealth = model.wealths()
+        cells = model.cells()
+        size = self.grid_width * self.grid_height
+        counts = np.stack([np.bincount(cells[wealth > 0], minlength=size),
+                           np.bincount(cells[wealth <= 0], minlength=size)], axis=1)
+
+        # A different model object means the server was reset
+        full = model is not self._model
+        if full:
+            changed = np.flatnonzero(counts.any(axis=1))
+        else:
+            changed = np.flatnonzero((counts != self._previous).any(axis=1))
+        self._model, self._previous = model, counts
+
+        return {'full': full, 'cells': np.column_stack([changed, counts[changed]]).ravel().tolist()}
+
+class DeltaChart(VisualizationElement):
+    """
+    Line chart of model variables that sends only the points recorded since the last frame
+
+    Reads the model's DataCollector or ColumnarCollector. Each frame is
+    {'full': bool, 'points': one list of new values per series}.
+    """
+
+    package_includes = []
+    local_includes = ["DeltaChart.js"]
+
+    def __init__(self, series, canvas_width=500, canvas_height=200, data_collector_name='datacollector'):
+        """
+        Args:
+            series (list): {"Label": model variable, "Color": CSS colour} per line, as for ChartModule
+            canvas_width, canvas_height (int): Chart size in pixels
+            data_collector_name (str): Attribute of the model holding its collector
+        """
+
+        self.series = series
+        self.data_collector_name = data_collector_name
+        self.js_code = "elements.push(new DeltaChartModule({}, {}, {}));".format(
+            json.dumps(series), canvas_width, canvas_height)
+        self._model = None
+        self._sent = 0
+
+    def render(self, model):
+        collector = getattr(model, self.data_collector_name)
+        model_vars = collector.model_vars() if callable(collector.model_vars) else collector.model_vars
+
+        full = model is not self._model
+        start = 0 if full else self._sent
+        points = [[float(value) for value in model_vars[line["Label"]][start:]] for line in self.series]
+        self._model = model
+        self._sent = start + (len(points[0]) if points else 0)
+
+        return {'full': full, 'points': points}
+
+def every_n_steps(model_cls, steps_per_frame):
+    """ Subclass of model_cls whose step() advances steps_per_frame steps
+
+    The server renders once per step() call, so this lets the simulation run steps_per_frame
+    times faster than the browser draws.
+    """
+
+    class Throttled(model_cls):
+        def step(self):
+            for _ in range(steps_per_frame):
+                model_cls.step(self)
+
+    Throttled.__name__ = model_cls.__name__
+    return Throttled
+
+def measure(model, elements, frames, steps_per_frame=1):
+    """ Headless stand-in for a browser: steps the model like ModularServer does and sizes every message
+
+    Args:
+        model: Model to step, already throttled if steps_per_frame > 1
+        elements (list): Visualization elements, as passed to ModularServer
+        frames (int): Number of frames to request after the initial one
+        steps_per_frame (int): Model steps behind each frame, for bytes_per_step
+
+    Returns:
+        dict: frames, bytes, bytes_per_frame, bytes_per_step and frames_per_second
+    """
+
+    def message():
+        return len(json.dumps({"type": "viz_state", "data": [element.render(model) for element in elements]}))
+
+    start = time.time()
+    total = message()
+    for _ in range(frames):
+        model.step()
+        total += message()
+    seconds = time.time() - start
+
+    return {'frames': frames + 1,
+            'bytes': total,
+            'bytes_per_frame': total / (frames + 1),
+            'bytes_per_step': total / max(frames * steps_per_frame, 1),
+            'frames_per_second': (frames + 1) / seconds if seconds else float('inf')}
+
+if __name__ == "__main__":
+    from mesa.visualization.modules import CanvasGrid, ChartModule
+    from MoneyModel import MoneyModel
+    from MoneyModel_Viz import agent_portrayal
+
+    N = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    side = int(np.ceil(np.sqrt(N)))
+
+    default = measure(MoneyModel(N, side, side),
+                      [CanvasGrid(agent_portrayal, side, side, 500, 500),
+                       ChartModule([{"Label": "Gini", "Color": "Black"}], data_collector_name='datacollector')],
+                      steps)
+    delta = measure(MoneyModel(N, side, side, True, 0),
+                    [CellCountGrid(side, side), DeltaChart([{"Label": "Gini", "Color": "Black"}])],
+                    steps)
+    for name, result in (('default', default), ('delta', delta)):
+        print('{:8s} {:10.0f} bytes/step {:8.1f} frames/s'.format(name, result['bytes_per_step'], result['frames_per_second']))
@@ -0,0 +1,109 @@
+"""reporting.py: Vectorized Gini coefficient and a columnar stand-in for Mesa's DataCollector"""
+
+import numpy as np
+
+def gini(wealth):
+    """ Gini coefficient of a wealth array
+
+    Same formula as compute_gini, 1 + 1/N - 2 * sum(x_i * (N - i)) / (N * sum(x)) over the
+    sorted wealths, evaluated with one sort and one dot product.
+
+    Args:
+        wealth (np.ndarray): Every agent's wealth
+
+    Returns:
+        float: Gini coefficient, 0 for perfect equality
+    """
+
+    x = np.sort(np.asarray(wealth), kind='stable')
+    N = len(x)
+    B = np.dot(x, np.arange(N, 0, -1)) / (N * x.sum())
+    return float(1 + (1/N) - 2*B)
+
+def _doubled(array):
+    """ Copy of array with twice as many rows, the new ones left uninitialized """
+
+    bigger = np.empty((2 * len(array),) + array.shape[1:], dtype=array.dtype)
+    bigger[:len(array)] = array
+    return bigger
+
+class ColumnarCollector(object):
+    """
+    Drop-in for DataCollector that records whole arrays per step into preallocated buffers
+
+    Model reporters take the model and return a number. Agent reporters take the model and
+    return an array with one value per agent, indexed by agent id, instead of being called
+    once per agent. Agent data can be kept every agent_every steps only, or not at all.
+
+    Buffers start at capacity steps and double whenever they fill up.
+    """
+
+    def __init__(self, model_reporters=None, agent_reporters=None, agent_every=1, capacity=128):
+        """
+        Args:
+            model_reporters (dict): Variable name : function(model) returning a number
+            agent_reporters (dict): Variable name : function(model) returning an array over agents
+            agent_every (int): Keep agent data every agent_every steps, never if 0 or None
+            capacity (int): Number of steps buffered before the first resize
+        """
+
+        self.model_reporters = dict(model_reporters or {})
+        self.agent_reporters = dict(agent_reporters or {})
+        self.agent_every = agent_every or 0
+        self.steps = 0
+
+        self._model_capacity = capacity
+        self._model_vars = {name: np.empty(capacity) for name in self.model_reporters}
+        self._agent_steps = np.empty(capacity, dtype=np.int64)
+        self._agent_vars = {}
+        self._agent_rows = 0
+
+    def collect(self, model):
+        """ Record the model reporters, and the agent reporters if this step is kept """
+
+        if self.steps == self._model_capacity:
+            self._model_vars = {name: _doubled(column) for name, column in self._model_vars.items()}
+            self._model_capacity *= 2
+        for name, reporter in self.model_reporters.items():
+            self._model_vars[name][self.steps] = reporter(model)
+
+        if self.agent_every and self.steps % self.agent_every == 0:
+            if self._agent_rows == len(self._agent_steps):
+                self._agent_steps = _doubled(self._agent_steps)
+                self._agent_vars = {name: _doubled(rows) for name, rows in self._agent_vars.items()}
+            for name, reporter in self.agent_reporters.items():
+                values = np.asarray(reporter(model))
+                if name not in self._agent_vars:
+                    self._agent_vars[name] = np.empty((len(self._agent_steps), len(values)), dtype=values.dtype)
+                self._agent_vars[name][self._agent_rows] = values
+            self._agent_steps[self._agent_rows] = self.steps
+            self._agent_rows += 1
+
+        self.steps += 1
+
+    def model_vars(self):
+        """ Recorded model variables, one array per reporter with an entry per step """
+        return {name: column[:self.steps] for name, column in self._model_vars.items()}
+
+    def agent_vars(self):
+        """ Recorded agent variables
+
+        Returns:
+            steps (np.ndarray): Steps agent data was kept on
+            values (dict): Variable name : kept steps x agents array
+        """
+        return self._agent_steps[:self._agent_rows], {name: rows[:self._agent_rows] for name, rows in self._agent_vars.items()}
+
+    def get_model_vars_dataframe(self):
+        """ Model variables as a DataFrame with one row per step, as DataCollector gives them """
+        import pandas as pd
+        return pd.DataFrame(self.model_vars())
+
+    def get_agent_vars_dataframe(self):
+        """ Agent variables as a DataFrame indexed by (Step, AgentID), as DataCollector gives them """
+        import pandas as pd
+        steps, values = self.agent_vars()
+        num_agents = next(iter(values.values())).shape[1] if values else 0
+        index = pd.MultiIndex.from_arrays([np.repeat(steps, num_agents), np.tile(np.arange(num_agents), len(steps))],
+                                          names=['Step', 'AgentID'])
+        return pd.DataFrame({name: rows.ravel() for name, rows in values.items()}, index=index)
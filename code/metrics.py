@@ -0,0 +1,198 @@
+"""metrics.py: Sinks that receive one record of statistics per CommunicationModel generation"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+import csv, glob, os
+import numpy as np
+
+# Fields of every generation record, in column order
+FIELDS = ('generation', 'games', 'cooperations', 'defections', 'no_actions',
+          'mean_chat_length', 'proportion_cooperate', 'proportion_defect')
+INTEGER_FIELDS = ('generation', 'games', 'cooperations', 'defections', 'no_actions')
+
+class ListSink(object):
+    """
+    Keeps every generation's statistics in memory
+
+    Exposes the lists CommunicationModel has always kept (total_cooperations,
+    total_defections, total_chats, total_proportions_cooperate, total_proportion_defect)
+    """
+
+    def __init__(self):
+        self.total_cooperations = []
+        self.total_defections = []
+        self.total_chats = []
+        self.total_proportions_cooperate = []
+        self.total_proportion_defect = []
+
+    def record(self, record):
+        """ Append one generation's statistics
+
+        Args:
+            record (dict): Generation statistics keyed by FIELDS
+        """
+        self.total_cooperations.append(record['cooperations'])
+        self.total_defections.append(record['defections'])
+        self.total_chats.append(record['mean_chat_length'])
+        self.total_proportions_cooperate.append(record['proportion_cooperate'])
+        self.total_proportion_defect.append(record['proportion_defect'])
+
+    def close(self):
+        pass
+
+class ChunkedSink(object):
+    """
+    Buffers records in preallocated column arrays and hands them to write_chunk once chunk_size have arrived
+
+    Memory use is bounded by chunk_size no matter how many generations are run.
+    """
+
+    def __init__(self, chunk_size=10000, fields=FIELDS):
+        """
+        Args:
+            chunk_size (int): Number of generations buffered before being written out
+            fields (tuple): Record fields to keep
+        """
+
+        self.chunk_size = chunk_size
+        self.fields = tuple(fields)
+        self.chunks_written = 0
+        self.rows_written = 0
+        self._columns = {field: np.empty(chunk_size, dtype=np.int64 if field in INTEGER_FIELDS else np.float64)
+                         for field in self.fields}
+        self._buffered = 0
+
+    def record(self, record):
+        """ Buffer one generation's statistics, writing a chunk when the buffer is full
+
+        Args:
+            record (dict): Generation statistics keyed by FIELDS
+        """
+
+        for field in self.fields:
+            self._columns[field][self._buffered] = record[field]
+        self._buffered += 1
+        if self._buffered == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """ Write out whatever is buffered as a chunk """
+
+        if self._buffered:
+            self.write_chunk({field: column[:self._buffered] for field, column in self._columns.items()})
+            self.chunks_written += 1
+            self.rows_written += self._buffered
+            self._buffered = 0
+
+    def pending(self):
+        """ Copy of the records buffered but not yet written, as field : array """
+        return {field: column[:self._buffered].copy() for field, column in self._columns.items()}
+
+    def rollback(self, rows_written, chunks_written, pending=None):
+        """ Return to the state saved in a checkpoint
+
+        Forgets everything written after rows_written rows in chunks_written chunks, so
+        generations written after the checkpoint are dropped rather than written a second
+        time, then buffers the records that were pending at the checkpoint again.
+        Subclasses also remove the written data itself.
+
+        Args:
+            rows_written, chunks_written (int): rows_written and chunks_written at the checkpoint
+            pending (dict): pending() at the checkpoint
+        """
+
+        self._buffered = 0
+        self.rows_written = rows_written
+        self.chunks_written = chunks_written
+        if pending:
+            for row in range(len(pending[self.fields[0]])):
+                self.record({field: pending[field][row] for field in self.fields})
+
+    def close(self):
+        self.flush()
+
+    def write_chunk(self, columns):
+        raise NotImplementedError
+
+class NpySink(ChunkedSink):
+    """
+    Streams records to a directory of .npz chunks, one array per field
+
+    Read a run back with load_npy_chunks(directory)
+    """
+
+    def __init__(self, directory, chunk_size=10000, fields=FIELDS, append=False):
+        """
+        Args:
+            directory (str): Directory chunks are written to
+            chunk_size (int): Number of generations buffered before being written out
+            fields (tuple): Record fields to keep
+            append (bool): Whether to number new chunks after ones already in directory, e.g. when resuming a run
+        """
+
+        ChunkedSink.__init__(self, chunk_size, fields)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        if append:
+            self.chunks_written = len(glob.glob(os.path.join(directory, 'chunk_*.npz')))
+
+    def rollback(self, rows_written, chunks_written, pending=None):
+        for path in glob.glob(os.path.join(self.directory, 'chunk_*.npz')):
+            if int(os.path.basename(path)[len('chunk_'):-len('.npz')]) >= chunks_written:
+                os.remove(path)
+        ChunkedSink.rollback(self, rows_written, chunks_written, pending)
+
+    def write_chunk(self, columns):
+        np.savez(os.path.join(self.directory, 'chunk_{:06d}.npz'.format(self.chunks_written)), **columns)
+
+class CSVSink(ChunkedSink):
+    """
+    Streams records to a CSV file, appending a batch of rows per chunk
+    """
+
+    def __init__(self, path, chunk_size=1000, fields=FIELDS, append=False):
+        """
+        Args:
+            path (str): CSV file to write
+            chunk_size (int): Number of generations buffered before being written out
+            fields (tuple): Record fields to keep
+            append (bool): Whether to add rows to an existing file rather than starting a new one
+        """
+
+        ChunkedSink.__init__(self, chunk_size, fields)
+        self.path = path
+        if append and os.path.exists(path):
+            with open(path, newline='') as f:
+                self.rows_written = sum(1 for row in csv.reader(f)) - 1
+        else:
+            with open(path, 'w', newline='') as f:
+                csv.writer(f).writerow(self.fields)
+
+    def rollback(self, rows_written, chunks_written, pending=None):
+        with open(self.path, newline='') as f:
+            kept = [row for row, _ in zip(csv.reader(f), range(rows_written + 1))]
+        with open(self.path, 'w', newline='') as f:
+            csv.writer(f).writerows(kept)
+        ChunkedSink.rollback(self, rows_written, chunks_written, pending)
+
+    def write_chunk(self, columns):
+        rows = zip(*(columns[field].tolist() for field in self.fields))
+        with open(self.path, 'a', newline='') as f:
+            csv.writer(f).writerows(rows)
+
+def load_npy_chunks(directory):
+    """ Concatenates the chunks written by an NpySink
+
+    Args:
+        directory (str): Directory the NpySink wrote to
+
+    Returns:
+        dict: Field : array over every recorded generation
+    """
+
+    columns = {}
+    for path in sorted(glob.glob(os.path.join(directory, 'chunk_*.npz'))):
+        with np.load(path) as chunk:
+            for field in chunk.files:
+                columns.setdefault(field, []).append(chunk[field])
+    return {field: np.concatenate(parts) for field, parts in columns.items()}
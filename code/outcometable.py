@@ -0,0 +1,247 @@
+"""outcometable.py: Precomputed outcomes of every game between automata in small genome spaces
+
+For small fsm_size and num_tokens, the number of behaviourally distinct automata is
+small enough to play every pairing once up front. Genomes themselves are far too many
+to tabulate (4 states and 2 tokens already give 1.7 million), but most encode the same
+behaviour, so the table is indexed by canonical automaton (see automata.py):
+
+    fsm_size  num_tokens  behaviours
+    2         2                    7
+    3         2                   67
+    2         3                  142
+    4         2                 1071
+    2         4                 1533
+    3         3                45582
+
+Tables are saved as .npy files under a directory named after the parameters and
+memory-mapped when loaded again, so repeated runs and sweeps start without replaying
+a single game.
+"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+import os, shutil
+import numpy as np
+
+import automata
+import tournament
+from game import COOPERATE, DEFECT
+
+# Most behaviours a table is built for; the decision and chat matrices grow with its square
+MAX_BEHAVIOURS = 4096
+
+# Where tables are saved by default
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'tables')
+
+# Bumped whenever the layout or enumeration order of saved tables changes
+FORMAT_VERSION = 1
+
+ARRAYS = ('actions', 'transitions', 'sizes', 'decisions', 'chat_lengths')
+
+def enumerate_behaviours(fsm_size, num_tokens, limit=MAX_BEHAVIOURS):
+    """ Lists every canonical automaton with at most fsm_size states
+
+    Automata are generated with states numbered in the breadth-first order canonicalize
+    uses, so each reachable automaton comes up exactly once; those with equivalent
+    states are skipped. Each is padded to fsm_size states with unreachable ones.
+
+    Args:
+        fsm_size (int): Number of states in agents' automata
+        num_tokens (int): Number of communication tokens allowed
+        limit (int): Most behaviours to enumerate before giving up
+
+    Returns:
+        actions (np.ndarray): K x fsm_size array of actions per state
+        transitions (np.ndarray): K x fsm_size x num_tokens array of next states
+        sizes (np.ndarray): Number of states each canonical automaton has before padding
+
+    Raises:
+        ValueError: If there are more than limit behaviours
+    """
+
+    tokens = list(range(1, num_tokens))
+    state_actions = tokens + [COOPERATE, DEFECT]
+    behaviours = []
+    actions, transitions = [], []
+
+    def extend(state, token):
+        # Every state created so far has its transitions filled in
+        if state == len(actions):
+            classes = automata.equivalence_classes(actions, transitions, range(len(actions)))
+            if len(set(classes.values())) == len(actions):
+                if len(behaviours) == limit:
+                    raise ValueError("fsm_size {} and num_tokens {} give more than {} behaviours to tabulate"
+                                     .format(fsm_size, num_tokens, limit))
+                behaviours.append(([row[:] for row in transitions], actions[:]))
+            return
+        if actions[state] < 0 or token == num_tokens:
+            extend(state + 1, 0)
+            return
+
+        for next_state in range(len(actions)):
+            transitions[state][token] = next_state
+            extend(state, token + 1)
+        if len(actions) < fsm_size:
+            for action in state_actions:
+                new_state = len(actions)
+                actions.append(action)
+                transitions.append([None] * num_tokens if action > 0 else [new_state] * num_tokens)
+                transitions[state][token] = new_state
+                extend(state, token + 1)
+                actions.pop()
+                transitions.pop()
+        transitions[state][token] = None
+
+    for action in tokens:
+        actions.append(action)
+        transitions.append([None] * num_tokens)
+        extend(0, 0)
+        actions.pop()
+        transitions.pop()
+
+    all_actions = np.full((len(behaviours), fsm_size), COOPERATE, dtype=np.int8)
+    all_transitions = np.empty((len(behaviours), fsm_size, num_tokens), dtype=np.int8)
+    all_transitions[...] = np.arange(fsm_size, dtype=np.int8)[:, None]
+    sizes = np.array([len(behaviour_actions) for _, behaviour_actions in behaviours], dtype=np.int8)
+    for i, (behaviour_transitions, behaviour_actions) in enumerate(behaviours):
+        all_actions[i, :len(behaviour_actions)] = behaviour_actions
+        all_transitions[i, :len(behaviour_transitions)] = behaviour_transitions
+    return all_actions, all_transitions, sizes
+
+def build_table(fsm_size, num_tokens, max_chat_length, limit=MAX_BEHAVIOURS, chunk_size=1 << 20):
+    """ Plays every pairing of behaviours, including each against itself
+
+    Args:
+        fsm_size (int): Number of states in agents' automata
+        num_tokens (int): Number of communication tokens allowed
+        max_chat_length (int): Maximum number of communications allowed
+        limit (int): Most behaviours to tabulate, see enumerate_behaviours
+        chunk_size (int): Number of games played at once
+
+    Returns:
+        OutcomeTable
+    """
+
+    actions, transitions, sizes = enumerate_behaviours(fsm_size, num_tokens, limit)
+    num_behaviours = len(actions)
+    decisions = np.empty((num_behaviours, num_behaviours), dtype=np.int8)
+    chat_lengths = np.empty((num_behaviours, num_behaviours), dtype=np.min_scalar_type(max_chat_length))
+
+    # Play is symmetric, so the upper triangle and diagonal cover every pairing
+    first, second = np.triu_indices(num_behaviours)
+    for start in range(0, len(first), chunk_size):
+        chunk_first, chunk_second = first[start:start + chunk_size], second[start:start + chunk_size]
+        decision1, decision2, chats = tournament.play_pairs(actions, transitions, chunk_first, chunk_second, max_chat_length)
+        decisions[chunk_first, chunk_second] = decision1
+        decisions[chunk_second, chunk_first] = decision2
+        chat_lengths[chunk_first, chunk_second] = chats
+        chat_lengths[chunk_second, chunk_first] = chats
+
+    return OutcomeTable(max_chat_length, actions, transitions, sizes, decisions, chat_lengths)
+
+def table_directory(fsm_size, num_tokens, max_chat_length, directory=DEFAULT_DIRECTORY):
+    """ Directory a table for the given parameters is saved in """
+    return os.path.join(directory, 'outcomes_v{}_s{}_t{}_c{}'.format(FORMAT_VERSION, fsm_size, num_tokens, max_chat_length))
+
+def load_table(fsm_size, num_tokens, max_chat_length, directory=DEFAULT_DIRECTORY, limit=MAX_BEHAVIOURS):
+    """ Memory-maps a saved table, building and saving it first if there isn't one
+
+    Args:
+        fsm_size (int): Number of states in agents' automata
+        num_tokens (int): Number of communication tokens allowed
+        max_chat_length (int): Maximum number of communications allowed
+        directory (str): Directory tables are saved under
+        limit (int): Most behaviours to tabulate, see enumerate_behaviours
+
+    Returns:
+        OutcomeTable
+    """
+
+    path = table_directory(fsm_size, num_tokens, max_chat_length, directory)
+    if not os.path.isdir(path):
+        table = build_table(fsm_size, num_tokens, max_chat_length, limit)
+
+        # Save next to the final directory and move it into place, so concurrent runs never see half a table
+        partial = '{}.partial{}'.format(path, os.getpid())
+        os.makedirs(partial)
+        for name in ARRAYS:
+            np.save(os.path.join(partial, name + '.npy'), getattr(table, name))
+        try:
+            os.rename(partial, path)
+        except OSError:
+            # Another process saved the same table first
+            shutil.rmtree(partial)
+            if not os.path.isdir(path):
+                raise
+
+    arrays = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r') for name in ARRAYS}
+    return OutcomeTable(max_chat_length, **arrays)
+
+class OutcomeTable(object):
+    """
+    Decisions and chat lengths of every game between canonical automata
+
+    decisions[i, j] is the final action of behaviour i in its game against behaviour j,
+    whichever of the two moved first, and chat_lengths[i, j] the number of communications
+    in that game.
+    """
+
+    def __init__(self, max_chat_length, actions, transitions, sizes, decisions, chat_lengths):
+        """
+        Args:
+            max_chat_length (int): Maximum number of communications the games were played with
+            actions, transitions (np.ndarray): Canonical automaton of each behaviour, padded to fsm_size states
+            sizes (np.ndarray): Number of states of each canonical automaton before padding
+            decisions, chat_lengths (np.ndarray): K x K outcome matrices
+        """
+
+        self.max_chat_length = max_chat_length
+        self.actions = actions
+        self.transitions = transitions
+        self.sizes = sizes
+        self.decisions = decisions
+        self.chat_lengths = chat_lengths
+        self.fsm_size, self.num_tokens = transitions.shape[1:]
+        self._index = None
+
+    def __len__(self):
+        return len(self.actions)
+
+    def index(self, key):
+        """ Returns the table index of a behaviour
+
+        Args:
+            key (bytes): Behaviour key from automata.behaviour_key
+        """
+
+        if self._index is None:
+            # Rows are canonical already, so their keys are just the unpadded bytes
+            self._index = {self.actions[i, :size].tobytes() + self.transitions[i, :size].tobytes(): i
+                           for i, size in enumerate(self.sizes.tolist())}
+        return self._index[key]
+
+    def behaviour_ids(self, actions, transitions):
+        """ Returns the table index of every agent's behaviour
+
+        Args:
+            actions (np.ndarray): N x fsm_size array of actions per state
+            transitions (np.ndarray): N x fsm_size x num_tokens array of next states
+        """
+
+        representatives, behaviour_ids, _ = automata.distinct_behaviours(actions, transitions)
+        indices = np.array([self.index(automata.behaviour_key(actions[row], transitions[row])) for row in representatives],
+                           dtype=np.intp)
+        return indices[behaviour_ids]
+
+    def outcomes(self, first, second):
+        """ Looks up a batch of games by table index
+
+        Args:
+            first, second (np.ndarray): Behaviour of agent 1 and agent 2 in each game
+
+        Returns:
+            decision1, decision2 (np.ndarray): Final action of agent 1 and agent 2 in each game
+            chat_lengths (np.ndarray): Number of communications in each game
+        """
+
+        return self.decisions[first, second], self.decisions[second, first], self.chat_lengths[first, second]
@@ -0,0 +1,98 @@
+"""pairing.py: Streaming generators of which agents play each other in a generation
+
+Every generator yields (first, second) arrays of agent indices in chunks of at most
+chunk_size games, so no strategy ever materializes all of a generation's pairings.
+"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+import numpy as np
+
+import selection
+
+# Default number of games per chunk
+CHUNK_SIZE = 1 << 18
+
+def round_robin(n, chunk_size=CHUNK_SIZE):
+    """ Every pair of agents plays once, in the same order as itertools.combinations
+
+    Args:
+        n (int): Number of agents
+        chunk_size (int): Maximum number of games per chunk (a single agent's games are never split)
+    """
+
+    start = 0
+    while start < n - 1:
+        # Take rows of the upper triangle until the chunk is full
+        stop, games = start, 0
+        while stop < n - 1 and (games == 0 or games + n - 1 - stop <= chunk_size):
+            games += n - 1 - stop
+            stop += 1
+
+        rows = np.arange(start, stop)
+        lengths = n - 1 - rows
+        first = np.repeat(rows, lengths)
+        offsets = np.arange(games) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        yield first, first + 1 + offsets
+        start = stop
+
+def random_opponents(n, k, rng, chunk_size=CHUNK_SIZE):
+    """ Every agent challenges k distinct opponents chosen at random
+
+    Agents play k games they started plus however many times they were picked as an
+    opponent, so the number of games per agent varies around 2k.
+
+    Args:
+        n (int): Number of agents
+        k (int): Opponents challenged by each agent
+        rng (np.random.Generator): Source of randomness
+        chunk_size (int): Maximum number of games per chunk
+    """
+
+    if not 0 < k < n:
+        raise ValueError("k must be between 1 and n - 1 opponents, got {}".format(k))
+
+    agents_per_chunk = max(1, chunk_size // k)
+    for start in range(0, n, agents_per_chunk):
+        challengers = np.arange(start, min(n, start + agents_per_chunk))
+        opponents = selection.sample_contestants(rng, n - 1, k, len(challengers))
+        opponents += opponents >= challengers[:, None]   # skip over the challenger itself
+        yield np.repeat(challengers, k), opponents.reshape(-1)
+
+def ring(n, radius, chunk_size=CHUNK_SIZE):
+    """ Agents sit on a ring and play every neighbour within radius places
+
+    Every agent plays exactly 2 * radius games.
+
+    Args:
+        n (int): Number of agents
+        radius (int): How many places to each side an agent's neighbourhood reaches
+        chunk_size (int): Maximum number of games per chunk
+    """
+
+    if not 0 < radius <= (n - 1) // 2:
+        raise ValueError("radius must be between 1 and (n - 1) // 2 so no pair meets twice, got {}".format(radius))
+
+    for distance in range(1, radius + 1):
+        for start in range(0, n, chunk_size):
+            first = np.arange(start, min(n, start + chunk_size))
+            yield first, (first + distance) % n
+
+def game_budget(n, games, rng, chunk_size=CHUNK_SIZE):
+    """ A fixed number of games between uniformly random pairs of distinct agents
+
+    Args:
+        n (int): Number of agents
+        games (int): Total number of games to play
+        rng (np.random.Generator): Source of randomness
+        chunk_size (int): Maximum number of games per chunk
+    """
+
+    if not games > 0:
+        raise ValueError("games must be at least 1, got {}".format(games))
+    for start in range(0, games, chunk_size):
+        size = min(chunk_size, games - start)
+        first = rng.integers(n, size=size)
+        second = rng.integers(n - 1, size=size)
+        second += second >= first
+        yield first, second
@@ -0,0 +1,94 @@
+"""plotting.py: Renders figures to files in a background process
+
+Rendering a figure can take as long as simulating a small run, and plt.show() blocks
+(or fails outright on a headless machine). A PlotWorker takes plotting calls that
+save to a file and runs them in a separate process using matplotlib's non-interactive
+Agg backend, so the caller can get on with simulating the next sweep point:
+
+    with PlotWorker() as plots:
+        plots.submit(sweep.plot_history, run, title, 'run.png')
+        ... keep simulating ...
+    # leaving the block waits for every figure and re-raises any plotting error
+"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+from concurrent.futures import ProcessPoolExecutor
+
+def _use_agg():
+    """ Worker initializer: switch to the file-only backend, even if the parent process already picked another """
+
+    import matplotlib
+    matplotlib.use('Agg')
+
+def check_destination(plots, path):
+    """ Raises ValueError if a PlotWorker is given without a file to save to - the worker cannot show figures """
+
+    if plots is not None and path is None:
+        raise ValueError("a PlotWorker can only save figures to files, so a path is needed")
+
+def render(plots, function, *args, path=None):
+    """ Calls a plotting function right away, or queues it on plots if a PlotWorker is given
+
+    The function is called with path as its path keyword argument, which must be given when plots is.
+    """
+
+    check_destination(plots, path)
+    if plots is None:
+        return function(*args, path=path)
+    return plots.submit(function, *args, path=path)
+
+class PlotWorker(object):
+    """
+    Background process(es) rendering figures to files
+
+    Submitted functions and their arguments are pickled to the worker, so they need to
+    be module-level functions (e.g. sweep.plot_sweep, sweep.plot_history) and must be
+    given the path to save to.
+    """
+
+    def __init__(self, processes=1):
+        """
+        Args:
+            processes (int): Number of figures rendered at once
+        """
+
+        self.processes = processes
+        self._executor = None
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, function, *args, **kwargs):
+        """ Queue a plotting call, starting the worker process on first use
+
+        Returns:
+            concurrent.futures.Future: Completes once the figure is saved
+        """
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.processes, initializer=_use_agg)
+        future = self._executor.submit(function, *args, **kwargs)
+        self._pending.append(future)
+        return future
+
+    def wait(self):
+        """ Block until every queued figure is saved, re-raising the first plotting error """
+
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def close(self):
+        """ Wait for queued figures, then stop the worker process """
+
+        try:
+            self.wait()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
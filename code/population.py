@@ -0,0 +1,99 @@
+"""population.py: Array-backed store holding the automata of every agent in a CommunicationModel"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+import numpy as np
+
+from game import COOPERATE, DEFECT
+
+def genome_dtype(fsm_size, num_tokens):
+    """ Smallest integer type able to hold every state, token and final action """
+    return np.int8 if max(fsm_size, num_tokens) < 128 else np.int32
+
+class Population(object):
+    """
+    Holds all agents' automata in preallocated arrays
+
+    Row i of actions is agent i's action map (state : action) and row i of
+    transitions is its transition table ((state, token) : new state).
+    CommunicationAgents keep views of their own row, so writing to the store
+    changes the agent and vice versa.
+
+    Each row also carries a lineage id: selection copies it along with the genome
+    and every newly drawn or mutated genome gets a fresh one, so two rows with the
+    same lineage id always hold the same automaton. Code that writes genomes
+    directly should call renew_lineage on the rows it changed.
+    """
+
+    def __init__(self, size, fsm_size, num_tokens):
+        """ Allocate storage for a population
+
+        Args:
+            size (int): Number of agents in the population
+            fsm_size (int): Number of states in agents' automata
+            num_tokens (int): Number of communication tokens allowed
+        """
+
+        self.size = size
+        self.fsm_size = fsm_size
+        self.num_tokens = num_tokens
+
+        dtype = genome_dtype(fsm_size, num_tokens)
+        self.actions = np.zeros((size, fsm_size), dtype=dtype)
+        self.transitions = np.zeros((size, fsm_size, num_tokens), dtype=dtype)
+
+        # Scratch space for selection, so copying parents never allocates
+        self._spare_actions = np.empty_like(self.actions)
+        self._spare_transitions = np.empty_like(self.transitions)
+
+        self.lineage = np.arange(size, dtype=np.int64)
+        self._next_lineage = size
+
+    def randomize(self, rng, rows=None):
+        """ Fills rows with random automata
+
+        Every state sends a token with probability .5 and otherwise makes a final
+        move (cooperate or defect with equal probability), except state 0 which always
+        sends a token. Every (state, token) transitions to a uniformly random state.
+
+        Args:
+            rng (np.random.Generator): Source of randomness
+            rows (sequence): Rows to fill, defaults to the whole population
+        """
+
+        rows = np.arange(self.size) if rows is None else np.asarray(rows, dtype=np.intp)
+        shape = (len(rows), self.fsm_size)
+
+        sends_token = rng.random(shape) < 0.5
+        sends_token[:, 0] = True
+        tokens = rng.integers(1, self.num_tokens, size=shape)
+        decisions = rng.choice([COOPERATE, DEFECT], size=shape)
+
+        self.actions[rows] = np.where(sends_token, tokens, decisions)
+        self.transitions[rows] = rng.integers(self.fsm_size, size=shape + (self.num_tokens,))
+        self.renew_lineage(rows)
+
+    def renew_lineage(self, rows=None):
+        """ Gives rows fresh lineage ids, marking their genomes as new
+
+        Args:
+            rows (sequence): Rows whose genomes changed, defaults to the whole population
+        """
+
+        rows = np.arange(self.size) if rows is None else np.asarray(rows, dtype=np.intp)
+        self.lineage[rows] = np.arange(self._next_lineage, self._next_lineage + len(rows))
+        self._next_lineage += len(rows)
+
+    def select(self, parents):
+        """ Replaces every row with a copy of its parent's row
+
+        Args:
+            parents (sequence): parents[i] is the row that row i is copied from
+        """
+
+        parents = np.asarray(parents, dtype=np.intp)
+        np.take(self.actions, parents, axis=0, out=self._spare_actions)
+        np.take(self.transitions, parents, axis=0, out=self._spare_transitions)
+        self.actions[...] = self._spare_actions
+        self.transitions[...] = self._spare_transitions
+        self.lineage[...] = self.lineage[parents]
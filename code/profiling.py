@@ -0,0 +1,101 @@
+"""profiling.py: Per-phase timing and counters for CommunicationModel generations"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+import time
+from contextlib import contextmanager, nullcontext
+
+# Phases of a generation, in the order they run
+PHASES = ('reset', 'pairing', 'chat', 'scoring', 'selection', 'copy', 'mutation')
+
+# Counters recorded each generation
+COUNTERS = ('games', 'chat_steps', 'mean_chat_steps', 'agents_allocated')
+
+# Columns of a profile record, suitable as the fields of a metrics sink
+FIELDS = ('generation',) + tuple(phase + '_seconds' for phase in PHASES) + ('total_seconds',) + COUNTERS
+
+class NullProfiler(object):
+    """
+    Profiler used when profiling is off - every hook is a no-op
+    """
+
+    enabled = False
+    _phase = nullcontext()
+
+    def start_generation(self, generation):
+        pass
+
+    def phase(self, name):
+        return self._phase
+
+    def count(self, name, value):
+        pass
+
+    def end_generation(self):
+        pass
+
+class Profiler(object):
+    """
+    Records wall time spent in each phase of a generation, plus counters
+
+    One record per generation is kept in records, or handed to sink if one is given
+    (e.g. metrics.CSVSink(path, fields=profiling.FIELDS)) so profiles can be written
+    next to the generation statistics.
+    """
+
+    enabled = True
+
+    def __init__(self, sink=None):
+        """
+        Args:
+            sink: Optional metrics sink receiving each generation's record instead of keeping it in memory
+        """
+
+        self.sink = sink
+        self.records = []
+        self._record = None
+        self._start = None
+
+    def start_generation(self, generation):
+        """ Begin a new record """
+
+        self._record = dict.fromkeys(FIELDS, 0)
+        self._record['generation'] = generation
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        """ Context manager adding the time spent inside it to phase name """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record[name + '_seconds'] += time.perf_counter() - start
+
+    def count(self, name, value):
+        """ Add value to counter name """
+        self._record[name] += value
+
+    def end_generation(self):
+        """ Finish the current record and store or emit it
+
+        Returns:
+            dict: The finished record
+        """
+
+        record = self._record
+        record['total_seconds'] = time.perf_counter() - self._start
+        if record['games']:
+            record['mean_chat_steps'] = record['chat_steps'] / record['games']
+
+        if self.sink is None:
+            self.records.append(record)
+        else:
+            self.sink.record(record)
+        self._record = None
+        return record
+
+    def totals(self):
+        """ Seconds spent in each phase over every generation kept in memory """
+        return {phase: sum(record[phase + '_seconds'] for record in self.records) for phase in PHASES}
@@ -0,0 +1,100 @@
+"""selection.py: Batched random draws for tournament selection and mutation"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+from collections import namedtuple
+import numpy as np
+
+from game import COOPERATE, DEFECT
+
+def sample_contestants(rng, population_size, num_compared, num_tournaments):
+    """ Draws the contestants of many tournaments at once
+
+    Each row is distributed like random.sample(range(population_size), num_compared):
+    the j-th contestant is a uniform pick among the population_size - j agents not yet
+    in that tournament, shifted past the ones already chosen.
+
+    Args:
+        rng (np.random.Generator): Source of randomness
+        population_size (int): Number of agents to choose from
+        num_compared (int): Number of distinct agents in each tournament
+        num_tournaments (int): Number of tournaments to draw
+
+    Returns:
+        np.ndarray: num_tournaments x num_compared array of agent indices
+    """
+
+    contestants = np.empty((num_tournaments, num_compared), dtype=np.intp)
+    for j in range(num_compared):
+        pick = rng.integers(population_size - j, size=num_tournaments)
+        for chosen in np.sort(contestants[:, :j], axis=1).T:
+            pick += pick >= chosen
+        contestants[:, j] = pick
+    return contestants
+
+# Where each child's single mutation lands, if it has one
+Mutations = namedtuple('Mutations', ['action_rows', 'action_states', 'new_actions',
+                                     'transition_rows', 'transition_states', 'transition_tokens', 'new_states'])
+
+def tournament_winners(fitness, contestants):
+    """ Picks the fittest contestant of every tournament, the earliest drawn one winning ties
+
+    Args:
+        fitness (np.ndarray): Fitness of each agent
+        contestants (np.ndarray): num_tournaments x num_compared array of agent indices
+
+    Returns:
+        np.ndarray: Index of the winning agent of each tournament
+    """
+    winner = np.argmax(fitness[contestants], axis=1)
+    return contestants[np.arange(len(contestants)), winner]
+
+def draw_mutations(rng, num_children, mutation_rate, fsm_size, num_tokens):
+    """ Rolls every child's mutation at once
+
+    A child mutates with probability mutation_rate. Half of mutations change one
+    state's action - to a random token with probability .5 (always for state 0),
+    otherwise to cooperate or defect - and half point one random (state, token)
+    transition at a random state.
+
+    Args:
+        rng (np.random.Generator): Source of randomness
+        num_children (int): Number of children in the new population
+        mutation_rate (float): Probability that a child mutates
+        fsm_size (int): Number of states in agents' automata
+        num_tokens (int): Number of communication tokens allowed
+
+    Returns:
+        Mutations: Rows, targets and new values of every action and transition mutation
+    """
+
+    mutate_flips = rng.random(num_children) < mutation_rate # Roll for mutation
+    mutate_actions = rng.random(num_children) < 0.5 # Roll for mutation type - action map vs transition table
+    state_choices = rng.integers(fsm_size, size=num_children)
+    token_flips = rng.random(num_children) < .5 # Roll for how to set new action map value
+    new_tokens = rng.integers(1, num_tokens, size=num_children)
+    new_decisions = rng.choice([COOPERATE, DEFECT], size=num_children)
+    transition_choices = rng.integers(fsm_size * num_tokens, size=num_children)
+    new_states = rng.integers(fsm_size, size=num_children)
+
+    action_rows = np.flatnonzero(mutate_flips & mutate_actions)
+    action_states = state_choices[action_rows]
+    new_actions = np.where(token_flips[action_rows] | (action_states == 0), new_tokens[action_rows], new_decisions[action_rows])
+
+    transition_rows = np.flatnonzero(mutate_flips & ~mutate_actions)
+    transition_states, transition_tokens = np.divmod(transition_choices[transition_rows], num_tokens)
+
+    return Mutations(action_rows, action_states, new_actions,
+                     transition_rows, transition_states, transition_tokens, new_states[transition_rows])
+
+def apply_mutations(population, mutations):
+    """ Writes mutations into a Population, giving mutated rows fresh lineage ids
+
+    Args:
+        population (Population): Store holding the new generation's genomes
+        mutations (Mutations): Mutations from draw_mutations
+    """
+
+    population.actions[mutations.action_rows, mutations.action_states] = mutations.new_actions
+    population.transitions[mutations.transition_rows, mutations.transition_states, mutations.transition_tokens] = mutations.new_states
+    population.renew_lineage(np.concatenate((mutations.action_rows, mutations.transition_rows)))
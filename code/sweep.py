@@ -0,0 +1,193 @@
+"""sweep.py: Runs CommunicationModel parameter sweeps across a pool of worker processes
+
+pandas, tqdm and matplotlib are only imported by the functions that use them, so
+worker processes that just simulate never load them.
+"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+import itertools, os
+from multiprocessing import Pool
+import numpy as np
+
+import communication
+from convergence import ConvergenceDetector
+
+# Per-generation statistics kept from every run
+HISTORY_COLUMNS = ('cooperations', 'defections', 'proportion_cooperate', 'proportion_defect', 'mean_chat_length', 'extrapolated')
+
+def parameter_grid(grid):
+    """ Expands a grid of parameter values into one dict of constructor arguments per combination
+
+    Args:
+        grid (dict): CommunicationModel argument name : list of values (or a single value)
+
+    Returns:
+        list: One dict of keyword arguments per combination, in itertools.product order
+    """
+
+    names = list(grid)
+    values = [grid[name] if np.ndim(grid[name]) else [grid[name]] for name in names]
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+def run_model(task):
+    """ Runs a single CommunicationModel and returns its per-generation statistics
+
+    The run's seed is handed to the model's own random generator, so a run gives
+    the same result regardless of which worker picks it up.
+
+    Args:
+        task (tuple): (run index, constructor kwargs, replicate, seed, iterations, convergence), where
+            convergence is None or ConvergenceDetector arguments for stopping the run early
+    """
+
+    index, kwargs, replicate, seed, iterations, convergence = task
+    model = communication.CommunicationModel(seed=seed, **kwargs)
+    simulated = model.run(iterations, None if convergence is None else ConvergenceDetector(**convergence))
+
+    history = {
+        'cooperations': model.total_cooperations,
+        'defections': model.total_defections,
+        'proportion_cooperate': model.total_proportions_cooperate,
+        'proportion_defect': model.total_proportion_defect,
+        'mean_chat_length': model.total_chats,
+        'extrapolated': np.arange(iterations) >= simulated,
+    }
+    return index, kwargs, replicate, seed, {column: np.asarray(values) for column, values in history.items()}
+
+def sweep(grid, iterations, replicates=1, seed=0, processes=None, progress=True, callback=None, convergence=None):
+    """ Runs every combination of parameters, each replicated with independent seeds
+
+    Args:
+        grid (dict): CommunicationModel argument name : list of values (or a single value)
+        iterations (int): Number of generations per run
+        replicates (int): Number of independently seeded runs per combination
+        seed (int): Root seed that every run's seed is derived from
+        processes (int): Number of worker processes, defaults to every core; 1 runs in this process
+        progress (bool): Whether to show a progress bar over finished runs
+        callback: Called with each run's table as soon as the run finishes, in whatever order
+            runs finish, e.g. to hand it to a plotting.PlotWorker while later runs simulate
+        convergence (dict): If given, ConvergenceDetector arguments - each run stops once it
+            converges and its remaining generations are extrapolated (dict(window=None) only
+            stops at exact fixed points)
+
+    Returns:
+        pandas.DataFrame: One row per generation of every run, with a column per swept
+            parameter plus replicate, seed, generation and the HISTORY_COLUMNS statistics, where
+            extrapolated marks generations filled in after the run converged
+    """
+
+    import pandas
+    from tqdm import tqdm
+
+    combinations = parameter_grid(grid)
+    seeds = np.random.SeedSequence(seed).generate_state(len(combinations) * replicates, dtype=np.uint64)
+    tasks = [(index, kwargs, replicate, int(seeds[index]), iterations, convergence)
+             for index, (kwargs, replicate) in enumerate(itertools.product(combinations, range(replicates)))]
+
+    processes = processes or os.cpu_count()
+    if processes == 1:
+        results = map(run_model, tasks)
+        pool = None
+    else:
+        pool = Pool(min(processes, len(tasks)))
+        results = pool.imap_unordered(run_model, tasks)
+
+    frames = [None] * len(tasks)
+    try:
+        for index, kwargs, replicate, run_seed, history in tqdm(results, total=len(tasks), disable=not progress):
+            frame = pandas.DataFrame(history)
+            frame.insert(0, 'generation', np.arange(len(frame)))
+            for position, name in enumerate(grid):
+                frame.insert(position, name, kwargs[name])
+            frame.insert(len(grid), 'replicate', replicate)
+            frame.insert(len(grid) + 1, 'seed', run_seed)
+            frames[index] = frame
+            if callback is not None:
+                callback(frame)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return pandas.concat(frames, ignore_index=True)
+
+def cooperative_generations(history, by, threshold=.1, burn_in=100):
+    """ Counts the generations of each run where the proportion of mutually cooperative games exceeded threshold
+
+    Args:
+        history (pandas.DataFrame): Table returned by sweep
+        by (str or list): Swept parameter(s) to group runs by
+        threshold (float): Proportion of cooperative games a generation needs to count
+        burn_in (int): Generations at the start of each run that are never counted
+
+    Returns:
+        pandas.DataFrame: One row per run with a cooperative_gens column
+    """
+
+    by = [by] if isinstance(by, str) else list(by)
+    cooperative = (history.proportion_cooperate > threshold) & (history.generation > burn_in)
+    counts = cooperative.groupby([history[column] for column in by + ['replicate']]).sum()
+    return counts.rename('cooperative_gens').reset_index()
+
+def plot_sweep(summary, x, y, title, xlabel, ylabel, path=None):
+    """ Plots a swept parameter against a run statistic, averaged over replicates
+
+    Args:
+        summary (pandas.DataFrame): Table with one row per run, e.g. from cooperative_generations
+        x (str): Column holding the swept parameter
+        y (str): Column holding the statistic to plot
+        title, xlabel, ylabel (str): Figure labels
+        path (str): File to save the figure to - shows it interactively if not given
+    """
+
+    import matplotlib.pyplot as plt
+
+    means = summary.groupby(x)[y].mean()
+
+    fig = plt.figure()
+    fig.suptitle(title, fontsize=14, fontweight='bold')
+
+    axis = fig.add_subplot(111)
+    axis.plot(means.index, means.values)
+    axis.set_xlabel(xlabel)
+    axis.set_ylabel(ylabel)
+    _finish(fig, path)
+
+def plot_history(history, title, path=None):
+    """ Plots proportion of mutually cooperative games and average chat length per generation of one run
+
+    Args:
+        history (pandas.DataFrame): Rows of a single run from the table returned by sweep
+        title (str): Figure title
+        path (str): File to save the figure to - shows it interactively if not given
+    """
+
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(12, 12))
+    fig.suptitle(title, fontsize=14, fontweight='bold')
+
+    axis = fig.add_subplot(211)
+    axis.plot(history.generation, history.proportion_cooperate)
+    axis.set_title('Proportion of Mutually Cooperative Games')
+    axis.set_xlabel('Generation')
+    axis.set_ylabel('Proportion of MutualCoop Games')
+
+    axis = fig.add_subplot(212)
+    axis.plot(history.generation, history.mean_chat_length)
+    axis.set_title('Average Chat Length')
+    axis.set_xlabel('Generation')
+    axis.set_ylabel('Average Chat Length (Tokens)')
+    _finish(fig, path)
+
+def _finish(fig, path):
+    """ Saves a figure to path, or shows it when no path is given """
+
+    import matplotlib.pyplot as plt
+
+    if path is None:
+        plt.show()
+    else:
+        fig.savefig(path)
+        plt.close(fig)
@@ -0,0 +1,72 @@
+"""test_checkpoint.py: Resuming a checkpointed CommunicationModel continues the original run exactly"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+import csv, os
+import numpy as np
+
+from communication import CommunicationModel
+from metrics import CSVSink, NpySink, load_npy_chunks, FIELDS
+
+PARAMETERS = dict(N=10, max_chat_length=5, seed=3)
+
+def interrupted_run(checkpoint_path, make_sink):
+    """ Runs 18 generations checkpointing every 10, then resumes from generation 10 and runs to 30 """
+
+    model = CommunicationModel(metrics=make_sink(False), checkpoint_every=10, checkpoint_path=checkpoint_path, **PARAMETERS)
+    model.run(18)
+    resumed = CommunicationModel.resume(checkpoint_path, metrics=make_sink(True))
+    resumed.run(20)
+    resumed.metrics.close()
+    return resumed
+
+def read_csv(path):
+    with open(path, newline='') as f:
+        return list(csv.reader(f))
+
+def chunk_lengths(directory):
+    lengths = []
+    for name in sorted(os.listdir(directory)):
+        with np.load(os.path.join(directory, name)) as chunk:
+            lengths.append(len(chunk['generation']))
+    return lengths
+
+def test_resume_with_list_sink(tmp_path):
+    uninterrupted = CommunicationModel(**PARAMETERS)
+    uninterrupted.run(30)
+
+    resumed = interrupted_run(str(tmp_path / 'run.npz'), lambda append: None)
+
+    assert resumed.generation == 30
+    assert resumed.total_cooperations == uninterrupted.total_cooperations
+    assert resumed.total_chats == uninterrupted.total_chats
+
+def test_resume_with_csv_sink(tmp_path):
+    expected_path = str(tmp_path / 'expected.csv')
+    uninterrupted = CommunicationModel(metrics=CSVSink(expected_path, chunk_size=4), **PARAMETERS)
+    uninterrupted.run(30)
+    uninterrupted.metrics.close()
+
+    path = str(tmp_path / 'run.csv')
+    interrupted_run(str(tmp_path / 'run.npz'), lambda append: CSVSink(path, chunk_size=4, append=append))
+
+    rows = read_csv(path)
+    assert len(rows) == 31
+    assert rows == read_csv(expected_path)
+
+def test_resume_with_npy_sink(tmp_path):
+    expected_dir = str(tmp_path / 'expected')
+    uninterrupted = CommunicationModel(metrics=NpySink(expected_dir, chunk_size=4), **PARAMETERS)
+    uninterrupted.run(30)
+    uninterrupted.metrics.close()
+
+    directory = str(tmp_path / 'run')
+    interrupted_run(str(tmp_path / 'run.npz'), lambda append: NpySink(directory, chunk_size=4, append=append))
+
+    # Checkpoints don't flush the sink, so chunks come out as if the run was never interrupted
+    assert chunk_lengths(directory) == chunk_lengths(expected_dir)
+    columns = load_npy_chunks(directory)
+    expected = load_npy_chunks(expected_dir)
+    np.testing.assert_array_equal(columns['generation'], np.arange(30))
+    for field in FIELDS:
+        np.testing.assert_array_equal(columns[field], expected[field])
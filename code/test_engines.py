@@ -0,0 +1,24 @@
+"""test_engines.py: Every way of running a generation reproduces play() exactly"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+import pytest
+
+import benchmark
+
+CONFIGURATIONS = [
+    dict(N=12, fsm_size=3, num_tokens=2, max_chat_length=10),
+    dict(N=15, fsm_size=4, num_tokens=2, max_chat_length=20),
+    dict(N=10, fsm_size=2, num_tokens=3, max_chat_length=5),
+]
+
+@pytest.mark.parametrize('parameters', CONFIGURATIONS)
+@pytest.mark.parametrize('seed', [0, 1])
+def test_engines_match_reference(tmp_path, parameters, seed):
+    # The table engine saves its outcome tables to table_dir, kept out of the repository here
+    parameters = dict(parameters, table_dir=str(tmp_path))
+    assert benchmark.check_engines(parameters, list(benchmark.ENGINES), 5, seed) == []
+
+@pytest.mark.parametrize('parameters', CONFIGURATIONS)
+def test_play_pairs_matches_play(parameters):
+    assert benchmark.check_play_pairs(parameters, 0)
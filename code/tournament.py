@@ -0,0 +1,193 @@
+"""tournament.py: Vectorized NumPy engine that plays many CommunicationAgent games at once"""
+
+__author__      = "Patrick Huston, Meg McCauley, Andrew Pan"
+
+import numpy as np
+
+from game import COOPERATE, DEFECT, NO_ACTION, payout_array, decision_index
+
+def round_robin(n):
+    """ Returns every pairing of n agents, in the same order as itertools.combinations
+
+    Args:
+        n (int): Number of agents
+
+    Returns:
+        first, second (np.ndarray): Row indices of agent 1 and agent 2 in each game
+    """
+    return np.triu_indices(n, 1)
+
+def distinct_genomes(actions, transitions):
+    """ Groups agents whose automata are identical
+
+    Args:
+        actions (np.ndarray): N x fsm_size array of actions per state
+        transitions (np.ndarray): N x fsm_size x num_tokens array of next states
+
+    Returns:
+        representatives (np.ndarray): Row of one agent holding each distinct genome
+        genome_ids (np.ndarray): Index of each agent's genome in representatives
+        counts (np.ndarray): Number of agents holding each distinct genome
+    """
+
+    genomes = np.concatenate((actions, transitions.reshape(len(transitions), -1)), axis=1)
+    _, representatives, genome_ids, counts = np.unique(genomes, axis=0, return_index=True,
+                                                       return_inverse=True, return_counts=True)
+    return representatives, genome_ids.reshape(-1), counts
+
+def distinct_round_robin(counts):
+    """ Returns every pairing of distinct genomes, including each genome against itself
+
+    Args:
+        counts (np.ndarray): Number of agents holding each distinct genome
+
+    Returns:
+        first, second (np.ndarray): Genome indices of agent 1 and agent 2 in each game
+        weights (np.ndarray): Number of agent pairings each game stands for
+    """
+
+    first, second = np.triu_indices(len(counts))
+    counts = counts.astype(np.int64)
+    weights = np.where(first == second, counts[first] * (counts[first] - 1) // 2, counts[first] * counts[second])
+    return first, second, weights
+
+def play_pairs(actions, transitions, first, second, max_chat_length):
+    """ Plays all given pairings against each other at once
+
+    Each chat step mirrors CommunicationModel.play: both agents choose an action,
+    the game ends once both have decided, otherwise undecided agents move to the
+    state given by the token they received. Games that have finished are dropped
+    from the working arrays so later steps only touch games still chatting.
+
+    Args:
+        actions (np.ndarray): N x fsm_size array of actions per state, as stored in a Population
+        transitions (np.ndarray): N x fsm_size x num_tokens array of next states
+        first (np.ndarray): Row index of agent 1 in each game
+        second (np.ndarray): Row index of agent 2 in each game
+        max_chat_length (int): Maximum number of communications allowed
+
+    Returns:
+        decision1, decision2 (np.ndarray): Final action of agent 1 and agent 2 in each game
+        chat_lengths (np.ndarray): Number of communications in each game
+    """
+
+    num_games = len(first)
+    decision1 = np.full(num_games, NO_ACTION, dtype=np.int8)
+    decision2 = np.full(num_games, NO_ACTION, dtype=np.int8)
+    chat_lengths = np.zeros(num_games, dtype=np.int32)
+
+    games = np.arange(num_games)
+    agent1 = np.asarray(first, dtype=np.intp)
+    agent2 = np.asarray(second, dtype=np.intp)
+    state1 = np.zeros(num_games, dtype=np.intp)
+    state2 = np.zeros(num_games, dtype=np.intp)
+    chosen1 = decision1.copy()
+    chosen2 = decision2.copy()
+
+    for _ in range(max_chat_length):
+        # Choose actions - an agent in a decision state makes its final move and sends 0
+        action1 = actions[agent1, state1]
+        action2 = actions[agent2, state2]
+        chosen1 = np.where((chosen1 == NO_ACTION) & (action1 < 0), action1, chosen1)
+        chosen2 = np.where((chosen2 == NO_ACTION) & (action2 < 0), action2, chosen2)
+        undecided1 = chosen1 == NO_ACTION
+        undecided2 = chosen2 == NO_ACTION
+        token1 = np.where(undecided1, action1, 0)
+        token2 = np.where(undecided2, action2, 0)
+
+        # Both agents have decided - record and drop finished games
+        done = ~(undecided1 | undecided2)
+        if done.any():
+            decision1[games[done]] = chosen1[done]
+            decision2[games[done]] = chosen2[done]
+            talking = ~done
+            games, agent1, agent2 = games[talking], agent1[talking], agent2[talking]
+            state1, state2 = state1[talking], state2[talking]
+            chosen1, chosen2 = chosen1[talking], chosen2[talking]
+            token1, token2 = token1[talking], token2[talking]
+            undecided1, undecided2 = undecided1[talking], undecided2[talking]
+            if not len(games):
+                break
+
+        # Undecided agents handle tokens
+        state1 = np.where(undecided1, transitions[agent1, state1, token2], state1)
+        state2 = np.where(undecided2, transitions[agent2, state2, token1], state2)
+        chat_lengths[games] += 1
+
+    # Games that hit max_chat_length keep whatever was decided so far
+    decision1[games] = chosen1
+    decision2[games] = chosen2
+
+    return decision1, decision2, chat_lengths
+
+def score_games(decision1, decision2):
+    """ Looks up the payout of each game
+
+    Args:
+        decision1, decision2 (np.ndarray): Final action of agent 1 and agent 2 in each game
+
+    Returns:
+        score1, score2 (np.ndarray): Payout to agent 1 and agent 2 in each game
+    """
+    scores = payout_array[decision_index(decision1), decision_index(decision2)]
+    return scores[:, 0], scores[:, 1]
+
+def tally_games(decision1, decision2, weights=None):
+    """ Counts cooperations, defections and no-actions the same way CommunicationModel.play does
+
+    Args:
+        decision1, decision2 (np.ndarray): Final action of agent 1 and agent 2 in each game
+        weights (np.ndarray): Optional number of times each game was played
+
+    Returns:
+        cooperations, defections, no_actions (int): Number of games ending in each outcome
+    """
+    cooperations = (decision1 == COOPERATE) & (decision2 == COOPERATE)
+    defections = (decision1 == DEFECT) & (decision2 == DEFECT)
+    no_actions = (decision1 == NO_ACTION) | (decision2 == NO_ACTION)
+    if weights is None:
+        return int(cooperations.sum()), int(defections.sum()), int(no_actions.sum())
+    return int(weights[cooperations].sum()), int(weights[defections].sum()), int(weights[no_actions].sum())
+
+def outcome_matrix(size, first, second, outcome1, outcome2):
+    """ Spreads per-game outcomes into a matrix indexed by [player, opponent]
+
+    Args:
+        size (int): Number of players
+        first, second (np.ndarray): Player index of agent 1 and agent 2 in each game
+        outcome1, outcome2 (np.ndarray): Outcome for agent 1 and agent 2 in each game
+    """
+
+    matrix = np.zeros((size, size), dtype=np.result_type(outcome1, outcome2))
+    matrix[first, second] = outcome1
+    matrix[second, first] = outcome2
+    return matrix
+
+def gather_scores(num_agents, agents, scores):
+    """ Collects each agent's scores from a flat list of (agent, score) entries
+
+    Entries for the same agent keep their relative order.
+
+    Args:
+        num_agents (int): Number of agents
+        agents (np.ndarray): Agent each score belongs to
+        scores (np.ndarray): Scores, one per entry in agents
+
+    Returns:
+        list: One list of scores per agent
+    """
+
+    order = np.argsort(agents, kind='stable')
+    boundaries = np.cumsum(np.bincount(agents, minlength=num_agents))[:-1]
+    return [agent_scores.tolist() for agent_scores in np.split(scores[order], boundaries)]
+
+def matrix_score_lists(score_matrix):
+    """ Builds each agent's list of scores from an N x N matrix of [agent, opponent] scores
+
+    Args:
+        score_matrix (np.ndarray): Score of each agent against each opponent
+    """
+
+    num_agents = len(score_matrix)
+    off_diagonal = ~np.eye(num_agents, dtype=bool)
+    return score_matrix[off_diagonal].reshape(num_agents, num_agents - 1).tolist()